@@ -1,10 +1,28 @@
 ﻿from __future__ import annotations
 
+import heapq
 import json
 import logging
+import operator
 import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import chain, islice
 from typing import Any, Dict
 
+import boto3
+import requests
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 # Version: 2.1.0 - Updated button text to "Execute Recommendations"
 
 from bedrock_agentcore import BedrockAgentCoreApp, RequestContext
@@ -12,41 +30,175 @@ from strands import Agent, tool
 from strands.models import BedrockModel
 from strands_tools import calculator
 
+from company_policies import (
+    COMPANY_COST_POLICIES,
+    batch_check,
+    get_policy,
+    get_policy_rationale,
+    get_recommended_type,
+    is_instance_type_allowed,
+)
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Faster parsing of the model's recommendations block when orjson is installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 app = BedrockAgentCoreApp()
 
+# AWS clients shared across tool invocations. botocore clients are
+# thread-safe and expensive to build, so each service's client is created
+# once from a single Session (whose client creation is not thread-safe).
+_SESSION = boto3.Session()
+_SESSION_LOCK = threading.Lock()
+_CLIENT_CONFIG = Config(max_pool_connections=32, retries={'mode': 'adaptive', 'total_max_attempts': 5})
 
-@tool
-def analyze_aws_costs(days: int = 7, service: str = None) -> str:
-    """Analyze AWS costs and identify anomalies, trends, and optimization opportunities."""
-    import boto3
-    import json
-    from datetime import datetime, timedelta
+
+@lru_cache(maxsize=None)
+def _client(service_name: str):
+    with _SESSION_LOCK:
+        return _SESSION.client(service_name, config=_CLIENT_CONFIG)
+
+
+# Pooled keep-alive session for calls to the SpendOptimo automation endpoint.
+# Status retries only apply to idempotent methods, so workflow POSTs are
+# retried on connection failures but never re-submitted after a response.
+_HTTP = requests.Session()
+_HTTP.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+))
+
+
+# Slow-changing AWS read results are served from memory for a short TTL
+# instead of re-querying the APIs on every tool call. Cost Explorer data only
+# refreshes a few times a day (and is billed per request); resource inventory
+# and Compute Optimizer output change on the order of minutes.
+_CE_CACHE_TTL_SECONDS = 3600
+_INVENTORY_CACHE_TTL_SECONDS = 300
+_CACHE_MAX_ENTRIES = 128
+_CACHE: Dict[tuple, tuple] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _cache_get(key: tuple):
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del _CACHE[key]
+            return None
+        return value
+
+
+def _cache_put(key: tuple, value: Any, ttl: float) -> None:
+    with _CACHE_LOCK:
+        _CACHE.pop(key, None)
+        if len(_CACHE) >= _CACHE_MAX_ENTRIES:
+            # Evict the oldest entry
+            del _CACHE[next(iter(_CACHE))]
+        _CACHE[key] = (time.monotonic() + ttl, value)
+
+
+def _cached(key: tuple, fetch, ttl: float, force_refresh: bool = False):
+    """Return the cached value for key, calling fetch() on a miss or forced refresh."""
+    if not force_refresh:
+        value = _cache_get(key)
+        if value is not None:
+            return value
+    value = fetch()
+    _cache_put(key, value, ttl)
+    return value
+
+
+def _fetch_cost_totals(ce_client, request_params: Dict[str, Any], single_service: str = None):
+    """Page through get_cost_and_usage and return (daily_totals, service_costs).
+
+    Cost Explorer has no paginator for this operation, so NextPageToken is
+    followed by hand and each page is folded into the running totals.
+    Ungrouped requests (filtered to one service) report a period Total,
+    which is attributed to ``single_service``.
+    """
+    daily_totals = defaultdict(float)
+    service_costs = defaultdict(float)
+    params = dict(request_params)
+    # Bind hot names locally for the per-group loop
+    float_ = float
+    get_metrics = operator.itemgetter('Metrics')
+    get_blended = operator.itemgetter('BlendedCost')
+    get_amount = operator.itemgetter('Amount')
+    get_service = operator.itemgetter(0)
     
+    while True:
+        page = ce_client.get_cost_and_usage(**params)
+        
+        for result in page['ResultsByTime']:
+            period_start = result['TimePeriod']['Start']
+            # Keep days without spend so the trend sees them
+            daily_total = daily_totals[period_start]
+            
+            for group in result['Groups']:
+                cost = float_(get_amount(get_blended(get_metrics(group))))
+                service_costs[get_service(group['Keys'])] += cost
+                daily_total += cost
+            
+            if single_service and not result['Groups']:
+                total = result.get('Total', {}).get('BlendedCost')
+                if total:
+                    cost = float_(total['Amount'])
+                    service_costs[single_service] += cost
+                    daily_total += cost
+            
+            daily_totals[period_start] = daily_total
+        
+        next_token = page.get('NextPageToken')
+        # Release the parsed page before fetching the next one so at most a
+        # single page of botocore dicts is alive at a time
+        del page
+        if not next_token:
+            return daily_totals, service_costs
+        params['NextPageToken'] = next_token
+
+
+@tool
+def analyze_aws_costs(days: int = 7, service: str = None, include_ri: bool = False) -> str:
+    """Analyze AWS costs and identify anomalies, trends, and optimization opportunities.
+    Set include_ri=True to also report EC2 Reserved Instance coverage (an extra billable Cost Explorer request)."""
     try:
-        # Initialize Cost Explorer client
-        ce_client = boto3.client('ce')
+        # Shared Cost Explorer client
+        ce_client = _client('ce')
         
         # Set date range
-        end_date = datetime.now().date()
+        end_date = date.today()
         start_date = end_date - timedelta(days=days)
+        start = start_date.isoformat()
+        end = end_date.isoformat()
+        
+        # Long windows are summarised per month to keep the response small;
+        # the trend then compares the latest month against the earlier ones
+        granularity = 'MONTHLY' if days >= 60 else 'DAILY'
+        recent_periods = 1 if granularity == 'MONTHLY' else 3
         
         # Build request parameters
         request_params = {
             'TimePeriod': {
-                'Start': start_date.strftime('%Y-%m-%d'),
-                'End': end_date.strftime('%Y-%m-%d')
+                'Start': start,
+                'End': end
             },
-            'Granularity': 'DAILY',
-            'Metrics': ['BlendedCost', 'UnblendedCost', 'UsageQuantity'],
-            'GroupBy': [
-                {'Type': 'DIMENSION', 'Key': 'SERVICE'}
-            ]
+            'Granularity': granularity,
+            'Metrics': ['BlendedCost']
         }
         
-        # Add service filter if specified
+        # Filter server-side if a service is specified (a single service needs
+        # no grouping), otherwise group by service
         if service:
             request_params['Filter'] = {
                 'Dimensions': {
@@ -54,56 +206,82 @@ def analyze_aws_costs(days: int = 7, service: str = None) -> str:
                     'Values': [service]
                 }
             }
+        else:
+            request_params['GroupBy'] = [
+                {'Type': 'DIMENSION', 'Key': 'SERVICE'}
+            ]
         
-        # Get cost and usage data
-        response = ce_client.get_cost_and_usage(**request_params)
-        
-        # Try to get Reserved Instance coverage (only for EC2)
-        ri_coverage = None
-        if not service or service == "Amazon Elastic Compute Cloud - Compute":
-            try:
-                ri_response = ce_client.get_reservation_coverage(
-                    TimePeriod={
-                        'Start': start_date.strftime('%Y-%m-%d'),
-                        'End': end_date.strftime('%Y-%m-%d')
-                    },
-                    GroupBy=[
-                        {'Type': 'DIMENSION', 'Key': 'INSTANCE_TYPE'}
-                    ]
-                )
-                ri_coverage = ri_response.get('CoveragesByTime', [])
-            except Exception as e:
-                # Reserved Instance coverage is optional, don't fail the whole request
-                ri_coverage = f"Reserved Instance coverage unavailable: {str(e)}"
-        
-        # Analyze the data
-        total_cost = 0
-        service_costs = {}
-        daily_costs = []
-        
-        for result in response['ResultsByTime']:
-            date = result['TimePeriod']['Start']
-            daily_total = 0
-            
-            for group in result['Groups']:
-                service_name = group['Keys'][0]
-                cost = float(group['Metrics']['BlendedCost']['Amount'])
-                daily_total += cost
+        cache_key = (
+            'cost_and_usage',
+            start,
+            end,
+            service,
+            granularity,
+            include_ri,
+        )
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            daily_totals, service_costs, ri_coverage = cached
+        else:
+            ri_coverage = None
+            # Reserved Instance coverage is opt-in and only applies to EC2
+            if include_ri and (not service or service == "Amazon Elastic Compute Cloud - Compute"):
+                # Cost data and Reserved Instance coverage are independent round trips,
+                # so issue them concurrently on the shared client
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    totals_future = executor.submit(_fetch_cost_totals, ce_client, request_params, service)
+                    ri_future = executor.submit(
+                        ce_client.get_reservation_coverage,
+                        TimePeriod={
+                            'Start': start,
+                            'End': end
+                        },
+                        GroupBy=[
+                            {'Type': 'DIMENSION', 'Key': 'INSTANCE_TYPE'}
+                        ]
+                    )
                 
-                if service_name not in service_costs:
-                    service_costs[service_name] = 0
-                service_costs[service_name] += cost
+                    # Get cost and usage data, aggregated per day and per service
+                    daily_totals, service_costs = totals_future.result()
+                
+                    try:
+                        ri_coverage = ri_future.result().get('CoveragesByTime', [])
+                    except Exception as e:
+                        # Reserved Instance coverage is optional, don't fail the whole request
+                        ri_coverage = f"Reserved Instance coverage unavailable: {str(e)}"
+            else:
+                # Get cost and usage data, aggregated per day and per service
+                daily_totals, service_costs = _fetch_cost_totals(ce_client, request_params, service)
             
-            daily_costs.append({'date': date, 'cost': daily_total})
-            total_cost += daily_total
+            # Don't cache a failed RI lookup so the next call retries it
+            if not isinstance(ri_coverage, str):
+                _cache_put(cache_key, (daily_totals, service_costs, ri_coverage), _CE_CACHE_TTL_SECONDS)
+        
+        # Spend per period in chronological order
+        period_costs = list(daily_totals.values())
+        total_cost = sum(period_costs)
+        period_total = total_cost
+        
+        if granularity == 'MONTHLY':
+            # Months differ in length and the first/last are partial, so
+            # compare per-day spend rates rather than raw monthly totals
+            bounds = [date.fromisoformat(d) for d in daily_totals] + [end_date]
+            period_costs = [
+                cost / max(1, (bounds[i + 1] - bounds[i]).days)
+                for i, cost in enumerate(period_costs)
+            ]
+            period_total = sum(period_costs)
         
         # Identify top services
-        top_services = sorted(service_costs.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_services = heapq.nlargest(5, service_costs.items(), key=operator.itemgetter(1))
         
         # Calculate trends
-        if len(daily_costs) >= 2:
-            recent_avg = sum(d['cost'] for d in daily_costs[-3:]) / min(3, len(daily_costs))
-            older_avg = sum(d['cost'] for d in daily_costs[:-3]) / max(1, len(daily_costs) - 3) if len(daily_costs) > 3 else recent_avg
+        num_periods = len(period_costs)
+        if num_periods >= 2:
+            recent_total = sum(period_costs[-recent_periods:])
+            recent_avg = recent_total / min(recent_periods, num_periods)
+            # The older window is everything the recent one doesn't cover
+            older_avg = (period_total - recent_total) / (num_periods - recent_periods) if num_periods > recent_periods else recent_avg
             trend = ((recent_avg - older_avg) / older_avg * 100) if older_avg > 0 else 0
         else:
             trend = 0
@@ -137,7 +315,7 @@ def analyze_aws_costs(days: int = 7, service: str = None) -> str:
             if top_service[1] > total_cost * 0.5:
                 analysis["recommendations"].append(f"🔍 {top_service[0]} accounts for {top_service[1]/total_cost*100:.1f}% of costs. Review for optimization opportunities.")
         
-        return json.dumps(analysis, indent=2)
+        return json.dumps(analysis, separators=(',', ':'), ensure_ascii=False)
         
     except Exception as e:
         return f"Error analyzing AWS costs: {str(e)}"
@@ -145,18 +323,16 @@ def analyze_aws_costs(days: int = 7, service: str = None) -> str:
 @tool
 def get_cost_anomalies(start_date: str = None, end_date: str = None, dimension: str = None) -> str:
     """Detect cost anomalies in AWS billing. Optional parameters: start_date (YYYY-MM-DD), end_date (YYYY-MM-DD), dimension (SERVICE, LINKED_ACCOUNT, etc.)"""
-    import boto3
-    import json
-    from datetime import datetime, timedelta
-    
     try:
-        ce_client = boto3.client('ce')
+        ce_client = _client('ce')
         
         # Set default date range if not provided
-        if not end_date:
-            end_date = datetime.now().strftime('%Y-%m-%d')
-        if not start_date:
-            start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        if not end_date or not start_date:
+            today = date.today()
+            if not end_date:
+                end_date = today.isoformat()
+            if not start_date:
+                start_date = (today - timedelta(days=30)).isoformat()
         
         # Build request parameters - get_anomalies requires specific format
         request_params = {
@@ -167,10 +343,15 @@ def get_cost_anomalies(start_date: str = None, end_date: str = None, dimension:
         }
         
         # Get anomaly detection results
-        response = ce_client.get_anomalies(**request_params)
+        cache_key = ('anomalies', start_date, end_date)
+        raw_anomalies = _cache_get(cache_key)
+        if raw_anomalies is None:
+            response = ce_client.get_anomalies(**request_params)
+            raw_anomalies = response.get('Anomalies', [])
+            _cache_put(cache_key, raw_anomalies, _CE_CACHE_TTL_SECONDS)
         
         anomalies = []
-        for anomaly in response.get('Anomalies', []):
+        for anomaly in raw_anomalies:
             anomalies.append({
                 "anomaly_id": anomaly.get('AnomalyId', 'N/A'),
                 "dimension": anomaly.get('Dimension', 'N/A'),
@@ -187,13 +368,13 @@ def get_cost_anomalies(start_date: str = None, end_date: str = None, dimension:
                 "message": "No cost anomalies detected in the specified period",
                 "period": f"{start_date} to {end_date}",
                 "dimension": dimension or "All dimensions"
-            }, indent=2)
+            }, separators=(',', ':'), ensure_ascii=False)
         
         return json.dumps({
             "period": f"{start_date} to {end_date}",
             "dimension": dimension or "All dimensions",
             "anomalies": anomalies
-        }, indent=2)
+        }, separators=(',', ':'), ensure_ascii=False)
         
     except Exception as e:
         return f"Error detecting cost anomalies: {str(e)}"
@@ -207,11 +388,6 @@ def execute_deploy_and_optimize_workflow() -> str:
     3. Analyze optimization opportunities
     4. Apply rightsizing if beneficial
     5. Verify the optimization results"""
-    import boto3
-    import json
-    import requests
-    from datetime import datetime
-    
     try:
         # Get the API URL from environment or construct it
         api_url = os.getenv('API_URL', 'https://api.spendoptimo.com')
@@ -229,10 +405,10 @@ def execute_deploy_and_optimize_workflow() -> str:
         }
         
         # Call the automation endpoint
-        response = requests.post(
+        response = _HTTP.post(
             f"{api_url}/v1/automation",
             json=automation_request,
-            headers={'Content-Type': 'application/json'},
+            headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip, deflate'},
             timeout=300  # Longer timeout for this workflow
         )
         
@@ -241,69 +417,69 @@ def execute_deploy_and_optimize_workflow() -> str:
             execution = result.get('execution', {})
             
             # Format the response
-            message = f"🚀 Optimization workflow executed successfully!\n\n"
-            message += f"**Execution ID**: {execution.get('id', 'N/A')}\n"
+            parts = [f"🚀 Optimization workflow executed successfully!\n\n"]
+            parts.append(f"**Execution ID**: {execution.get('id', 'N/A')}\n")
             
             if execution.get('payload', {}).get('workflow'):
                 workflow = execution['payload']['workflow']
                 
                 # Show workflow steps and results
-                message += "\n**Workflow Steps Completed:**\n"
+                parts.append("\n**Workflow Steps Completed:**\n")
                 
                 if workflow.get('discover_instances'):
                     step = workflow['discover_instances']
-                    message += f"✅ **Discover Instances**: {step.get('message', 'Completed')}\n"
+                    parts.append(f"✅ **Discover Instances**: {step.get('message', 'Completed')}\n")
                     if step.get('instances'):
                         instances = step['instances']
-                        message += f"   - Found {len(instances)} running instances\n"
+                        parts.append(f"   - Found {len(instances)} running instances\n")
                         for instance in instances[:3]:  # Show first 3 instances
-                            message += f"   - {instance['instance_id']} ({instance['instance_type']})\n"
+                            parts.append(f"   - {instance['instance_id']} ({instance['instance_type']})\n")
                 
                 if workflow.get('collect_usage_metrics'):
                     step = workflow['collect_usage_metrics']
-                    message += f"✅ **Collect Usage Metrics**: {step.get('message', 'Completed')}\n"
+                    parts.append(f"✅ **Collect Usage Metrics**: {step.get('message', 'Completed')}\n")
                     if step.get('instance_metrics'):
                         instance_metrics = step['instance_metrics']
-                        message += f"   - Collected metrics for {len(instance_metrics)} instances\n"
+                        parts.append(f"   - Collected metrics for {len(instance_metrics)} instances\n")
                 
                 if workflow.get('analyze_optimization'):
                     step = workflow['analyze_optimization']
-                    message += f"✅ **Analyze Optimization**: {step.get('message', 'Completed')}\n"
+                    parts.append(f"✅ **Analyze Optimization**: {step.get('message', 'Completed')}\n")
                     if step.get('summary'):
                         summary = step['summary']
-                        message += f"   - Total Instances: {summary.get('total_instances', 0)}\n"
-                        message += f"   - Instances to Optimize: {summary.get('instances_to_optimize', 0)}\n"
-                        message += f"   - Estimated Savings: {summary.get('total_estimated_savings', 'N/A')}\n"
+                        parts.append(f"   - Total Instances: {summary.get('total_instances', 0)}\n")
+                        parts.append(f"   - Instances to Optimize: {summary.get('instances_to_optimize', 0)}\n")
+                        parts.append(f"   - Estimated Savings: {summary.get('total_estimated_savings', 'N/A')}\n")
                 
                 if workflow.get('apply_rightsizing'):
                     step = workflow['apply_rightsizing']
                     if step.get('status') == 'success':
-                        message += f"✅ **Apply Rightsizing**: {step.get('message', 'Completed')}\n"
+                        parts.append(f"✅ **Apply Rightsizing**: {step.get('message', 'Completed')}\n")
                         if step.get('summary'):
                             summary = step['summary']
-                            message += f"   - Instances Modified: {summary.get('instances_modified', 0)}\n"
-                            message += f"   - Instances Skipped: {summary.get('instances_skipped', 0)}\n"
+                            parts.append(f"   - Instances Modified: {summary.get('instances_modified', 0)}\n")
+                            parts.append(f"   - Instances Skipped: {summary.get('instances_skipped', 0)}\n")
                     elif step.get('status') == 'skipped':
-                        message += f"⏭️ **Apply Rightsizing**: {step.get('message', 'Skipped')}\n"
+                        parts.append(f"⏭️ **Apply Rightsizing**: {step.get('message', 'Skipped')}\n")
                     else:
-                        message += f"❌ **Apply Rightsizing**: {step.get('message', 'Failed')}\n"
+                        parts.append(f"❌ **Apply Rightsizing**: {step.get('message', 'Failed')}\n")
                 
                 if workflow.get('verify_optimization'):
                     step = workflow['verify_optimization']
-                    message += f"✅ **Verify Optimization**: {step.get('message', 'Completed')}\n"
+                    parts.append(f"✅ **Verify Optimization**: {step.get('message', 'Completed')}\n")
                     if step.get('summary'):
                         summary = step['summary']
-                        message += f"   - Successful Verifications: {summary.get('successful_verifications', 0)}\n"
+                        parts.append(f"   - Successful Verifications: {summary.get('successful_verifications', 0)}\n")
                 
                 # Add overall workflow status
                 if workflow.get('status') == 'completed':
-                    message += f"\n🎉 **Overall Status**: {workflow.get('message', 'Workflow completed successfully')}"
+                    parts.append(f"\n🎉 **Overall Status**: {workflow.get('message', 'Workflow completed successfully')}")
                 else:
-                    message += f"\n⚠️ **Overall Status**: {workflow.get('message', 'Workflow completed with warnings')}"
+                    parts.append(f"\n⚠️ **Overall Status**: {workflow.get('message', 'Workflow completed with warnings')}")
             else:
-                message += "**Workflow executed** - check the execution details for results."
+                parts.append("**Workflow executed** - check the execution details for results.")
             
-            return message
+            return "".join(parts)
         else:
             return f"❌ Failed to execute optimization workflow. Status: {response.status_code}, Response: {response.text}"
             
@@ -313,9 +489,6 @@ def execute_deploy_and_optimize_workflow() -> str:
 @tool
 def execute_rightsizing_workflow() -> str:
     """Execute the rightsizing workflow via Workflow Agent for ALL services (EC2, S3, Lambda)."""
-    import json
-    import requests
-    
     try:
         # Get the API URL from environment or construct it
         api_url = os.getenv('API_URL', 'https://api.spendoptimo.com')
@@ -324,9 +497,8 @@ def execute_rightsizing_workflow() -> str:
         
         # Get current recommendations by calling the agent's analysis
         try:
-            # Call get_rightsizing_recommendations to get current recommendations
-            recommendations_data = get_rightsizing_recommendations()
-            rec_data = json.loads(recommendations_data)
+            # Build current recommendations directly, skipping the tool's JSON encoding
+            rec_data = _get_rightsizing_recommendations_dict()
             recommendations = rec_data.get('recommendations', [])
             
             if not recommendations:
@@ -354,10 +526,10 @@ def execute_rightsizing_workflow() -> str:
         }
         
         # Call the automation endpoint
-        response = requests.post(
+        response = _HTTP.post(
             f"{api_url}/v1/automation",
             json=automation_request,
-            headers={'Content-Type': 'application/json'},
+            headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip, deflate'},
             timeout=30
         )
         
@@ -366,25 +538,25 @@ def execute_rightsizing_workflow() -> str:
             result = response.json()
             execution_id = result.get('execution_id', 'N/A')
             
-            message = f"Workflow execution started successfully!\n\n"
-            message += f"**Execution ID**: {execution_id}\n"
-            message += f"**Resource Types**: {', '.join(resource_types)}\n"
-            message += f"**Recommendations**: {len(recommendations)}\n\n"
-            message += "The Workflow Agent is processing your optimization request in the background.\n"
-            message += "This process typically takes 3-5 minutes to complete.\n\n"
+            parts = [f"Workflow execution started successfully!\n\n"]
+            parts.append(f"**Execution ID**: {execution_id}\n")
+            parts.append(f"**Resource Types**: {', '.join(resource_types)}\n")
+            parts.append(f"**Recommendations**: {len(recommendations)}\n\n")
+            parts.append("The Workflow Agent is processing your optimization request in the background.\n")
+            parts.append("This process typically takes 3-5 minutes to complete.\n\n")
             
             # List what will be done per service
             if 'EC2' in resource_types:
                 ec2_count = sum(1 for r in recommendations if r.get('resource_type') == 'EC2')
-                message += f"- **EC2**: {ec2_count} instance(s) will be stopped, modified, and restarted\n"
+                parts.append(f"- **EC2**: {ec2_count} instance(s) will be stopped, modified, and restarted\n")
             if 'Lambda' in resource_types:
                 lambda_count = sum(1 for r in recommendations if r.get('resource_type') == 'Lambda')
-                message += f"- **Lambda**: {lambda_count} function(s) configuration will be updated\n"
+                parts.append(f"- **Lambda**: {lambda_count} function(s) configuration will be updated\n")
             if 'S3' in resource_types:
                 s3_count = sum(1 for r in recommendations if r.get('resource_type') == 'S3')
-                message += f"- **S3**: {s3_count} bucket(s) lifecycle policies will be configured\n"
+                parts.append(f"- **S3**: {s3_count} bucket(s) lifecycle policies will be configured\n")
             
-            return message
+            return "".join(parts)
         elif response.status_code == 200:
             # Sync workflow completed (shouldn't happen but handle it)
             result = response.json()
@@ -404,8 +576,7 @@ def execute_rightsizing_workflow() -> str:
 # def check_rds_instances():
 #     """Check RDS instances against company policies and return recommendations."""
 #     import boto3
-#     import re
-#     from company_policies import get_policy, get_policy_rationale
+#     from company_policies import get_policy, get_policy_rationale, compile_glob_patterns
 #     
 #     recommendations = []
 #     
@@ -417,7 +588,7 @@ def execute_rightsizing_workflow() -> str:
 #         if not rds_policy:
 #             return []
 #         
-#         disallowed_classes = rds_policy.get('disallowed_instance_classes', [])
+#         disallowed_classes = compile_glob_patterns(tuple(rds_policy.get('disallowed_instance_classes', [])))
 #         recommended_classes = rds_policy.get('recommended_classes', [])
 #         
 #         for db in response['DBInstances']:
@@ -427,14 +598,7 @@ def execute_rightsizing_workflow() -> str:
 #             allocated_storage = db.get('AllocatedStorage', 0)
 #             
 #             # Check instance class against policy
-#             is_disallowed = False
-#             for pattern in disallowed_classes:
-#                 regex_pattern = pattern.replace(".", r"\.").replace("*", ".*")
-#                 if re.match(f"^{regex_pattern}$", db_class):
-#                     is_disallowed = True
-#                     break
-#             
-#             if is_disallowed:
+#             if disallowed_classes.fullmatch(db_class):
 #                 recommended_class = recommended_classes[1] if len(recommended_classes) > 1 else 'db.t3.small'
 #                 recommendations.append({
 #                     "resource_type": "RDS",
@@ -442,6 +606,7 @@ def execute_rightsizing_workflow() -> str:
 #                     "current_class": db_class,
 #                     "recommended_class": recommended_class,
 #                     "estimated_monthly_savings": "$30.00",
+#                     "estimated_monthly_savings_usd": 30.0,
 #                     "reason": rds_policy.get('rationale', 'Policy violation - expensive instance class'),
 #                     "confidence": "Policy-Based",
 #                     "recommendation_source": "Company Cost Policy"
@@ -455,6 +620,7 @@ def execute_rightsizing_workflow() -> str:
 #                     "current_storage_type": storage_type,
 #                     "recommended_storage_type": "gp3",
 #                     "estimated_monthly_savings": "$15.00",
+#                     "estimated_monthly_savings_usd": 15.0,
 #                     "reason": "Policy violation - expensive provisioned IOPS storage",
 #                     "confidence": "Policy-Based",
 #                     "recommendation_source": "Company Cost Policy"
@@ -466,38 +632,57 @@ def execute_rightsizing_workflow() -> str:
 #     return recommendations
 
 
+def _total_reserved_concurrency(lambda_client) -> float:
+    """Return the concurrency reserved across all functions in the account.
+
+    Falls back to infinity when account settings can't be read, so callers
+    go on to check each function individually.
+    """
+    try:
+        limits = lambda_client.get_account_settings()['AccountLimit']
+        return limits['ConcurrentExecutions'] - limits['UnreservedConcurrentExecutions']
+    except (ClientError, BotoCoreError, KeyError) as e:
+        logger.warning(f"Could not read Lambda account settings: {e}")
+        return float('inf')
+
+
 def check_lambda_functions():
     """Check Lambda functions against company policies and return (recommendations, total_count)."""
-    import boto3
-    from company_policies import get_policy
-    
     recommendations = []
     total_functions = 0
     
+    # Nothing to enforce - don't spend a round trip listing functions
+    lambda_policy = get_policy('lambda')
+    if not lambda_policy:
+        logger.warning("No Lambda policy found")
+        return recommendations, total_functions
+    
     try:
-        lambda_client = boto3.client('lambda')
-        response = lambda_client.list_functions(MaxItems=100)
+        # The shared client's pool is sized for the concurrency lookups fanned out below
+        lambda_client = _client('lambda')
+        # ListFunctions returns at most 50 functions per page
+        paginator = lambda_client.get_paginator('list_functions')
+        functions = [
+            func
+            for page in paginator.paginate(PaginationConfig={'PageSize': 50})
+            for func in page['Functions']
+        ]
         
-        total_functions = len(response['Functions'])
+        total_functions = len(functions)
         logger.info(f"Found {total_functions} Lambda functions to analyze")
         
-        lambda_policy = get_policy('lambda')
-        if not lambda_policy:
-            logger.warning("No Lambda policy found")
-            return recommendations, total_functions
-        
         max_concurrency = lambda_policy.get('reserved_concurrency', {}).get('max', 100)
         functions_over_provisioned = 0
         
-        for func in response['Functions']:
+        for func in functions:
             function_name = func['FunctionName']
             memory_size = func['MemorySize']
             
-            logger.info(f"Checking Lambda {function_name}: {memory_size} MB")
+            logger.debug("Checking Lambda %s: %d MB", function_name, memory_size)
             
             # Check memory (over-provisioned if > 5GB)
             if memory_size > 5120:  # 5GB threshold
-                logger.info(f"Lambda {function_name} is over-provisioned: {memory_size} MB > 5120 MB")
+                logger.info("Lambda %s is over-provisioned: %d MB > 5120 MB", function_name, memory_size)
                 functions_over_provisioned += 1
                 
                 # Calculate savings based on memory reduction
@@ -516,135 +701,172 @@ def check_lambda_functions():
                     "current_memory_mb": memory_size,
                     "recommended_memory_mb": 1024,
                     "estimated_monthly_savings": f"${monthly_savings:.2f}",
+                    "estimated_monthly_savings_usd": monthly_savings,
                     "reason": "Over-provisioned memory - most functions don't need > 5GB, recommend 1GB",
                     "confidence": "Policy-Based",
                     "recommendation_source": "Company Cost Policy"
                 })
-            
-            # Check reserved concurrency
-            try:
-                concurrency_response = lambda_client.get_function_concurrency(FunctionName=function_name)
-                reserved_concurrency = concurrency_response.get('ReservedConcurrentExecutions')
+        
+        # Reserved concurrency needs one call per function, so fan the calls
+        # out and read the results back in function order. Skip them entirely
+        # when the policy sets no ceiling, or when the account's total reserved
+        # concurrency is already within it (no single function can exceed it).
+        if max_concurrency is not None and _total_reserved_concurrency(lambda_client) > max_concurrency:
+            not_found = lambda_client.exceptions.ResourceNotFoundException
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                concurrency_futures = [
+                    (func['FunctionName'], executor.submit(lambda_client.get_function_concurrency, FunctionName=func['FunctionName']))
+                    for func in functions
+                ]
                 
-                if reserved_concurrency and reserved_concurrency > max_concurrency:
-                    logger.info(f"Lambda {function_name} concurrency exceeds limit: {reserved_concurrency} > {max_concurrency}")
-                    recommendations.append({
-                        "resource_type": "Lambda",
-                        "function_name": function_name,
-                        "current_concurrency": reserved_concurrency,
-                        "recommended_concurrency": max_concurrency,
-                        "estimated_monthly_savings": "$10.00",
-                        "reason": f"Reserved concurrency exceeds policy maximum of {max_concurrency}",
-                        "confidence": "Policy-Based",
-                        "recommendation_source": "Company Cost Policy"
-                    })
-            except:
-                pass  # Function might not have reserved concurrency set
+                for function_name, future in concurrency_futures:
+                    try:
+                        reserved_concurrency = future.result().get('ReservedConcurrentExecutions')
+                    except not_found:
+                        # Deleted since it was listed - nothing to check
+                        continue
+                    except ClientError as e:
+                        logger.warning("Could not read concurrency for Lambda %s: %s", function_name, e.response['Error']['Code'])
+                        continue
+                    except BotoCoreError as e:
+                        # Timeouts and connection errors only affect this function
+                        logger.warning("Could not read concurrency for Lambda %s: %s", function_name, e)
+                        continue
+                    
+                    if reserved_concurrency and reserved_concurrency > max_concurrency:
+                        logger.info("Lambda %s concurrency exceeds limit: %d > %d", function_name, reserved_concurrency, max_concurrency)
+                        recommendations.append({
+                            "resource_type": "Lambda",
+                            "function_name": function_name,
+                            "current_concurrency": reserved_concurrency,
+                            "recommended_concurrency": max_concurrency,
+                            "estimated_monthly_savings": "$10.00",
+                            "estimated_monthly_savings_usd": 10.0,
+                            "reason": f"Reserved concurrency exceeds policy maximum of {max_concurrency}",
+                            "confidence": "Policy-Based",
+                            "recommendation_source": "Company Cost Policy"
+                        })
         
         logger.info(f"Lambda Check Complete: {total_functions} functions analyzed, {functions_over_provisioned} over-provisioned, {len(recommendations)} total recommendations")
     
     except Exception as e:
         logger.error(f"Error checking Lambda functions: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
     
     return recommendations, total_functions
 
 
+def _check_bucket_lifecycle(s3, cloudwatch, bucket_name: str):
+    """Probe one bucket for a lifecycle policy and return (checked, recommendation).
+
+    checked is False when the bucket could not be inspected; recommendation is
+    None when the bucket is compliant or was skipped.
+    """
+    logger.debug("Checking bucket: %s", bucket_name)
+    
+    # Check if lifecycle policy exists
+    try:
+        s3.get_bucket_lifecycle_configuration(Bucket=bucket_name)
+        logger.debug("Bucket %s has lifecycle policy - compliant", bucket_name)
+        return True, None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+            # Skip buckets we can't access (permissions, etc.)
+            logger.warning("Skipping bucket %s - error: %s", bucket_name, e.response['Error']['Code'])
+            return False, None
+    except Exception as e:
+        logger.warning("Skipping bucket %s - exception: %s", bucket_name, e)
+        return False, None
+    
+    logger.info("Bucket %s has NO lifecycle policy - adding recommendation", bucket_name)
+    
+    # Try to get bucket size for better savings estimate
+    estimated_savings = 5.0  # Conservative default if we can't get size
+    try:
+        response = cloudwatch.get_metric_statistics(
+            Namespace='AWS/S3',
+            MetricName='BucketSizeBytes',
+            Dimensions=[
+                {'Name': 'BucketName', 'Value': bucket_name},
+                {'Name': 'StorageType', 'Value': 'StandardStorage'}
+            ],
+            StartTime=datetime.now() - timedelta(days=1),
+            EndTime=datetime.now(),
+            Period=86400,
+            Statistics=['Average']
+        )
+        if response['Datapoints']:
+            size_bytes = response['Datapoints'][0]['Average']
+            size_gb = size_bytes / (1024**3)
+            # Estimate: 30% savings from Intelligent-Tiering (conservative)
+            # Standard storage: ~$0.023/GB/month, Intelligent-Tiering access: ~$0.004/GB/month
+            # Potential savings: ~$0.007/GB/month for infrequently accessed data
+            estimated_savings = round(size_gb * 0.007, 2)
+            # Cap at reasonable max
+            if estimated_savings > 100:
+                estimated_savings = 100.0
+            elif estimated_savings < 5:
+                estimated_savings = 5.0  # Minimum estimate
+    except Exception:
+        pass  # Use default if CloudWatch metrics unavailable
+    
+    return True, {
+        "resource_type": "S3",
+        "bucket_name": bucket_name,
+        "issue": "No lifecycle policy configured",
+        "recommended_action": "Add Intelligent-Tiering or transition to Glacier",
+        "estimated_monthly_savings": f"${estimated_savings:.2f}",
+        "estimated_monthly_savings_usd": estimated_savings,
+        "reason": "Policy requires lifecycle management for all buckets",
+        "confidence": "Policy-Based",
+        "recommendation_source": "Company Cost Policy"
+    }
+
+
 def check_s3_buckets():
     """Check S3 buckets for lifecycle policies and return (recommendations, total_count)."""
-    import boto3
-    from botocore.exceptions import ClientError
-    from company_policies import get_policy
-    
     recommendations = []
     total_buckets = 0
     
+    # Nothing to enforce - don't spend a round trip listing buckets
+    s3_policy = get_policy('s3')
+    if not s3_policy or not s3_policy.get('lifecycle_policy_required'):
+        logger.info("S3 lifecycle policy not required by company policy")
+        return recommendations, total_buckets
+    
     try:
-        s3 = boto3.client('s3')
+        # The shared clients' pools are sized for the per-bucket probes fanned out below
+        s3 = _client('s3')
         response = s3.list_buckets()
         
         total_buckets = len(response['Buckets'])
         logger.info(f"Found {total_buckets} S3 buckets to analyze")
         
-        s3_policy = get_policy('s3')
-        if not s3_policy or not s3_policy.get('lifecycle_policy_required'):
-            logger.info("S3 lifecycle policy not required by company policy")
-            return recommendations, total_buckets
-        
         buckets_checked = 0
         buckets_skipped = 0
         
-        for bucket in response['Buckets']:
-            bucket_name = bucket['Name']
-            logger.info(f"Checking bucket: {bucket_name}")
+        cloudwatch = _client('cloudwatch')
+        bucket_names = [bucket['Name'] for bucket in response['Buckets']]
+        
+        # Every bucket needs its own lifecycle probe (and possibly a size
+        # lookup), so run them concurrently and collect results in order
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = executor.map(lambda name: _check_bucket_lifecycle(s3, cloudwatch, name), bucket_names)
             
-            # Check if lifecycle policy exists
-            try:
-                lifecycle_config = s3.get_bucket_lifecycle_configuration(Bucket=bucket_name)
-                logger.info(f"Bucket {bucket_name} has lifecycle policy - compliant")
-                buckets_checked += 1
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchLifecycleConfiguration':
-                    logger.info(f"Bucket {bucket_name} has NO lifecycle policy - adding recommendation")
-                    buckets_checked += 1
-                    
-                    # Try to get bucket size for better savings estimate
-                    estimated_savings = 5.0  # Conservative default if we can't get size
-                    try:
-                        cloudwatch = boto3.client('cloudwatch')
-                        from datetime import datetime, timedelta
-                        response = cloudwatch.get_metric_statistics(
-                            Namespace='AWS/S3',
-                            MetricName='BucketSizeBytes',
-                            Dimensions=[
-                                {'Name': 'BucketName', 'Value': bucket_name},
-                                {'Name': 'StorageType', 'Value': 'StandardStorage'}
-                            ],
-                            StartTime=datetime.now() - timedelta(days=1),
-                            EndTime=datetime.now(),
-                            Period=86400,
-                            Statistics=['Average']
-                        )
-                        if response['Datapoints']:
-                            size_bytes = response['Datapoints'][0]['Average']
-                            size_gb = size_bytes / (1024**3)
-                            # Estimate: 30% savings from Intelligent-Tiering (conservative)
-                            # Standard storage: ~$0.023/GB/month, Intelligent-Tiering access: ~$0.004/GB/month
-                            # Potential savings: ~$0.007/GB/month for infrequently accessed data
-                            estimated_savings = round(size_gb * 0.007, 2)
-                            # Cap at reasonable max
-                            if estimated_savings > 100:
-                                estimated_savings = 100.0
-                            elif estimated_savings < 5:
-                                estimated_savings = 5.0  # Minimum estimate
-                    except:
-                        pass  # Use default if CloudWatch metrics unavailable
-                    
-                    recommendations.append({
-                        "resource_type": "S3",
-                        "bucket_name": bucket_name,
-                        "issue": "No lifecycle policy configured",
-                        "recommended_action": "Add Intelligent-Tiering or transition to Glacier",
-                        "estimated_monthly_savings": f"${estimated_savings:.2f}",
-                        "reason": "Policy requires lifecycle management for all buckets",
-                        "confidence": "Policy-Based",
-                        "recommendation_source": "Company Cost Policy"
-                    })
-                    logger.info(f"Added recommendation for {bucket_name} (est. savings: ${estimated_savings:.2f}) - total recs: {len(recommendations)}")
-                else:
-                    # Skip buckets we can't access (permissions, etc.)
-                    logger.warning(f"Skipping bucket {bucket_name} - error: {e.response['Error']['Code']}")
+            for bucket_name, (checked, recommendation) in zip(bucket_names, results):
+                if not checked:
                     buckets_skipped += 1
-            except Exception as e:
-                logger.warning(f"Skipping bucket {bucket_name} - exception: {str(e)}")
-                buckets_skipped += 1
+                    continue
+                buckets_checked += 1
+                
+                if recommendation:
+                    recommendations.append(recommendation)
+                    logger.debug("Added recommendation for %s (est. savings: %s) - total recs: %d", bucket_name, recommendation['estimated_monthly_savings'], len(recommendations))
         
         logger.info(f"S3 Check Complete: {buckets_checked} checked, {buckets_skipped} skipped, {len(recommendations)} recommendations")
     
     except Exception as e:
         logger.error(f"Error checking S3 buckets: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
     
     return recommendations, total_buckets
@@ -655,14 +877,13 @@ def check_s3_buckets():
 # def check_ebs_volumes():
 #     """Check EBS volumes against company policies and return recommendations."""
 #     import boto3
-#     import re
 #     from company_policies import get_policy
 #     
 #     recommendations = []
 #     
 #     try:
 #         ec2 = boto3.client('ec2')
-#         response = ec2.describe_volumes()
+#         paginator = ec2.get_paginator('describe_volumes')
 #         
 #         ebs_policy = get_policy('ebs')
 #         if not ebs_policy:
@@ -671,40 +892,41 @@ def check_s3_buckets():
 #         disallowed_types = ebs_policy.get('disallowed_volume_types', [])
 #         recommended_type = ebs_policy.get('recommended_types', ['gp3'])[0]
 #         
-#         for volume in response['Volumes']:
-#             volume_id = volume['VolumeId']
-#             volume_type = volume['VolumeType']
-#             volume_size = volume['Size']
-#             state = volume['State']
-#             
-#             # Check for disallowed types (io1, io2 - expensive provisioned IOPS)
-#             if volume_type in disallowed_types:
+#         # Check for disallowed types (io1, io2 - expensive provisioned IOPS);
+#         # filter server-side so compliant volumes never come back
+#         if disallowed_types:
+#             pages = paginator.paginate(Filters=[{'Name': 'volume-type', 'Values': sorted(set(disallowed_types))}])
+#             for volume in (v for page in pages for v in page['Volumes']):
+#                 volume_type = volume['VolumeType']
 #                 recommendations.append({
 #                     "resource_type": "EBS",
-#                     "volume_id": volume_id,
+#                     "volume_id": volume['VolumeId'],
 #                     "current_type": volume_type,
 #                     "recommended_type": recommended_type,
-#                     "size_gb": volume_size,
+#                     "size_gb": volume['Size'],
 #                     "estimated_monthly_savings": "$15.00",
+#                     "estimated_monthly_savings_usd": 15.0,
 #                     "reason": f"Policy violation - {volume_type} is expensive, use {recommended_type} instead",
 #                     "confidence": "Policy-Based",
 #                     "recommendation_source": "Company Cost Policy"
 #                 })
-#             
-#             # Check for unattached volumes (waste of money)
-#             if state == 'available':
-#                 recommendations.append({
-#                     "resource_type": "EBS",
-#                     "volume_id": volume_id,
-#                     "volume_type": volume_type,
-#                     "size_gb": volume_size,
-#                     "issue": "Unattached volume",
-#                     "recommended_action": "Snapshot and delete",
-#                     "estimated_monthly_savings": "$10.00",
-#                     "reason": "Unattached volumes waste money - clean up after 7 days per policy",
-#                     "confidence": "Policy-Based",
-#                     "recommendation_source": "Company Cost Policy"
-#                 })
+#         
+#         # Check for unattached volumes (waste of money)
+#         pages = paginator.paginate(Filters=[{'Name': 'status', 'Values': ['available']}])
+#         for volume in (v for page in pages for v in page['Volumes']):
+#             recommendations.append({
+#                 "resource_type": "EBS",
+#                 "volume_id": volume['VolumeId'],
+#                 "volume_type": volume['VolumeType'],
+#                 "size_gb": volume['Size'],
+#                 "issue": "Unattached volume",
+#                 "recommended_action": "Snapshot and delete",
+#                 "estimated_monthly_savings": "$10.00",
+#                 "estimated_monthly_savings_usd": 10.0,
+#                 "reason": "Unattached volumes waste money - clean up after 7 days per policy",
+#                 "confidence": "Policy-Based",
+#                 "recommendation_source": "Company Cost Policy"
+#             })
 #     
 #     except Exception as e:
 #         logger.error(f"Error checking EBS volumes: {str(e)}")
@@ -712,263 +934,322 @@ def check_s3_buckets():
 #     return recommendations
 
 
+def _describe_running_instances(ec2_client):
+    """Return a summary dict for every running EC2 instance.
+
+    Tags are kept as the raw Key/Value list from the API; they are only turned
+    into a dict for the few instances that end up in a policy violation.
+    """
+    paginator = ec2_client.get_paginator('describe_instances')
+    pages = paginator.paginate(
+        Filters=[
+            {'Name': 'instance-state-name', 'Values': ['running']}
+        ],
+        PaginationConfig={'PageSize': 1000}
+    )
+    
+    running_instances = []
+    for reservation in (r for page in pages for r in page['Reservations']):
+        for instance in reservation['Instances']:
+            running_instances.append({
+                'instance_id': instance['InstanceId'],
+                'instance_type': instance['InstanceType'],
+                'tags': instance.get('Tags', [])
+            })
+    return running_instances
+
+
+def _iter_ec2_instance_recommendations(compute_optimizer):
+    """Yield every Compute Optimizer EC2 recommendation, following nextToken."""
+    params = {}
+    while True:
+        response = compute_optimizer.get_ec2_instance_recommendations(**params)
+        yield from response.get('instanceRecommendations', [])
+        next_token = response.get('nextToken')
+        if not next_token:
+            return
+        params['nextToken'] = next_token
+
+
 @tool
-def get_rightsizing_recommendations(resource_types: str = "EC2,Lambda,S3", account_ids: str = None, limit: int = 50) -> str:
+def get_rightsizing_recommendations(resource_types: str = "EC2,Lambda,S3", account_ids: str = None, limit: int = 50, force_refresh: bool = False) -> str:
     """Get cost optimization recommendations for AWS services based on company policies and AWS optimizer data.
     
     Supports: EC2 (instances), Lambda (functions), S3 (buckets)
     
     Company policies are checked first for immediate recommendations, then AWS optimization services if available.
-    Optional parameters: resource_types (comma-separated: EC2,Lambda,S3), account_ids, limit (max recommendations)"""
-    import boto3
-    import json
-    from company_policies import is_instance_type_allowed, get_recommended_type, get_policy_rationale, get_policy, COMPANY_COST_POLICIES
+    Optional parameters: resource_types (comma-separated: EC2,Lambda,S3), account_ids, limit (max recommendations),
+    force_refresh (bypass the 5-minute cache of EC2 inventory and Compute Optimizer data)"""
+    try:
+        # Compact output: the agent doesn't need indentation and it inflates the token count
+        result = _get_rightsizing_recommendations_dict(resource_types, account_ids, limit, force_refresh)
+        return json.dumps(result, separators=(',', ':'), ensure_ascii=False)
+    except Exception as e:
+        return f"Error getting rightsizing recommendations: {str(e)}"
+
+
+# Shared read-only default for missing nested Compute Optimizer fields
+_EMPTY: Dict[str, Any] = {}
+
+# Rough monthly savings for moving a disallowed instance to its recommended
+# type, keyed by exact instance type or by two-character family prefix
+_EC2_VIOLATION_SAVINGS = {
+    'r5': 50.0,  # R5/M5 to T3 saves ~$50/month
+    'm5': 50.0,
+    'c5': 40.0,  # C5 to T3 saves ~$40/month
+    't3.large': 20.0,
+    't3.xlarge': 40.0,
+}
+
+
+def _ec2_path(force_refresh: bool = False):
+    """Check running EC2 instances against policy and Compute Optimizer.
+
+    Returns (policy_violations, recommendations, running_instances, enrollment_status).
+    """
+    recommendations = []
+    policy_violations = []
+    
+    ec2_client = _client('ec2')
+    compute_optimizer = _client('compute-optimizer')
     
+    region = ec2_client.meta.region_name
+    
+    # Check enrollment status
+    try:
+        enrollment_status = _cached(
+            ('co_enrollment_status', region),
+            lambda: compute_optimizer.get_enrollment_status().get('status', 'Unknown'),
+            _INVENTORY_CACHE_TTL_SECONDS,
+            force_refresh,
+        )
+    except:
+        enrollment_status = 'Unknown'
+    
+    # Get company policy
+    policy_rationale = get_policy_rationale("ec2")
+    # Step 1: Get all running EC2 instances
     try:
-        recommendations = []
-        policy_violations = []
-        metrics_recommendations = []
-        total_savings = 0
-        enrollment_status = 'N/A'
+        running_instances = _cached(
+            ('ec2_running_instances', region),
+            lambda: _describe_running_instances(ec2_client),
+            _INVENTORY_CACHE_TTL_SECONDS,
+            force_refresh,
+        )
         
-        # Get EC2 recommendations - POLICY-BASED FIRST
-        if 'EC2' in resource_types:
-            ec2_client = boto3.client('ec2')
-            compute_optimizer = boto3.client('compute-optimizer')
+        # Step 2: Check each instance against policy (once per distinct type)
+        allowed_types = batch_check((instance['instance_type'] for instance in running_instances), "ec2")
+        for instance in running_instances:
+            instance_id = instance['instance_id']
+            instance_type = instance['instance_type']
             
-            # Check enrollment status
-            try:
-                enrollment_response = compute_optimizer.get_enrollment_status()
-                enrollment_status = enrollment_response.get('status', 'Unknown')
-            except:
-                enrollment_status = 'Unknown'
-            
-            # Get company policy
-            ec2_policy = get_policy("ec2")
-            policy_rationale = get_policy_rationale("ec2")
-            # Step 1: Get all running EC2 instances
-            try:
-                ec2_response = ec2_client.describe_instances(
-                    Filters=[
-                        {'Name': 'instance-state-name', 'Values': ['running']}
-                    ]
-                )
+            # Check if instance type is allowed by policy
+            if not allowed_types[instance_type]:
+                # Policy violation - recommend change
+                recommended_type = get_recommended_type(instance_type, "ec2")
                 
-                running_instances = []
-                for reservation in ec2_response['Reservations']:
-                    for instance in reservation['Instances']:
-                        running_instances.append({
-                            'instance_id': instance['InstanceId'],
-                            'instance_type': instance['InstanceType'],
-                            'launch_time': instance['LaunchTime'].isoformat(),
-                            'tags': {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
-                        })
+                # Estimate savings (rough calculation based on instance family)
+                estimated_savings = _EC2_VIOLATION_SAVINGS.get(instance_type) or _EC2_VIOLATION_SAVINGS.get(instance_type[:2], 0.0)
                 
-                # Step 2: Check each instance against policy
-                for instance in running_instances:
-                    instance_id = instance['instance_id']
-                    instance_type = instance['instance_type']
-                    
-                    # Check if instance type is allowed by policy
-                    if not is_instance_type_allowed(instance_type, "ec2"):
-                        # Policy violation - recommend change
-                        recommended_type = get_recommended_type(instance_type, "ec2")
-                        
-                        # Estimate savings (rough calculation based on instance family)
-                        estimated_savings = 0
-                        if instance_type.startswith('r5') or instance_type.startswith('m5'):
-                            estimated_savings = 50.0  # R5/M5 to T3 saves ~$50/month
-                        elif instance_type.startswith('c5'):
-                            estimated_savings = 40.0  # C5 to T3 saves ~$40/month
-                        elif 't3.large' in instance_type:
-                            estimated_savings = 20.0
-                        elif 't3.xlarge' in instance_type:
-                            estimated_savings = 40.0
-                        
-                        total_savings += estimated_savings
-                        
-                        policy_violations.append({
-                            "resource_type": "EC2",
-                            "instance_id": instance_id,
-                            "current_instance_type": instance_type,
-                            "recommended_instance_type": recommended_type,
-                            "violation_type": "disallowed_instance_type",
-                            "reason": policy_rationale,
-                            "estimated_monthly_savings": f"${estimated_savings:.2f}",
-                            "confidence": "Policy-Based",
-                            "recommendation_source": "Company Cost Policy",
-                            "tags": instance.get('tags', {})
-                        })
+                policy_violations.append({
+                    "resource_type": "EC2",
+                    "instance_id": instance_id,
+                    "current_instance_type": instance_type,
+                    "recommended_instance_type": recommended_type,
+                    "violation_type": "disallowed_instance_type",
+                    "reason": policy_rationale,
+                    "estimated_monthly_savings": f"${estimated_savings:.2f}",
+                    "estimated_monthly_savings_usd": estimated_savings,
+                    "confidence": "Policy-Based",
+                    "recommendation_source": "Company Cost Policy",
+                    "tags": {tag['Key']: tag['Value'] for tag in instance['tags']}
+                })
+        
+        # Step 3: Try to get Compute Optimizer recommendations (if available)
+        try:
+            violation_ids = {pv['instance_id'] for pv in policy_violations}
+            optimizer_recs = _cached(
+                ('co_ec2_recommendations', region),
+                lambda: list(_iter_ec2_instance_recommendations(compute_optimizer)),
+                _INVENTORY_CACHE_TTL_SECONDS,
+                force_refresh,
+            )
+            for rec in optimizer_recs:
+                instance_arn = rec.get('instanceArn', '')
+                instance_id = instance_arn.split('/')[-1] if instance_arn else 'N/A'
                 
-                # Step 3: Try to get Compute Optimizer recommendations (if available)
-                try:
-                    optimizer_response = compute_optimizer.get_ec2_instance_recommendations()
-                    
-                    for rec in optimizer_response.get('instanceRecommendations', []):
-                        instance_arn = rec.get('instanceArn', '')
-                        instance_id = instance_arn.split('/')[-1] if instance_arn else 'N/A'
-                        
-                        # Skip if already flagged as policy violation
-                        if any(pv['instance_id'] == instance_id for pv in policy_violations):
-                            continue
-                        
-                        if rec.get('recommendationOptions'):
-                            best_option = rec['recommendationOptions'][0]
-                            savings = best_option.get('savingsOpportunity', {}).get('estimatedMonthlySavings', {})
-                            savings_value = float(savings.get('value', 0))
-                            
-                            # Check if recommended type is policy-compliant
-                            recommended_type = best_option.get('instanceType', 'N/A')
-                            if not is_instance_type_allowed(recommended_type, "ec2"):
-                                # Override with policy-compliant type
-                                recommended_type = get_recommended_type(recommended_type, "ec2")
-                            
-                            total_savings += savings_value
-                            
-                            recommendations.append({
-                                "resource_type": "EC2",
-                                "instance_id": instance_id,
-                                "current_instance_type": rec.get('currentInstanceType', 'N/A'),
-                                "recommended_instance_type": recommended_type,
-                                "estimated_monthly_savings": f"${savings_value:.2f}",
-                                "confidence": best_option.get('rank', 'N/A'),
-                                "recommendation_source": "Compute Optimizer",
-                                "utilization_metrics": {
-                                    "cpu": f"{rec.get('utilizationMetrics', {}).get('cpuUtilization', {}).get('value', 0):.1f}%",
-                                    "memory": f"{rec.get('utilizationMetrics', {}).get('memoryUtilization', {}).get('value', 0):.1f}%"
-                                }
-                            })
-                except Exception as e:
-                    # Compute Optimizer data not available - that's OK, we have policy-based recommendations
-                    logger.info(f"Compute Optimizer not available: {str(e)}")
-                    pass
+                # Skip if already flagged as policy violation
+                if instance_id in violation_ids:
+                    continue
                 
-            except Exception as e:
-                return f"Error analyzing EC2 instances: {str(e)}"
-        
-        # Combine policy violations, metrics recommendations, and optimizer recommendations
-        all_recommendations = policy_violations + metrics_recommendations + recommendations
-        
-        # Check other services based on resource_types parameter
-        service_summary = {"EC2": len(all_recommendations)}
-        
-        # FUTURE ENHANCEMENT - Uncomment to enable RDS optimization
-        # if 'RDS' in resource_types:
-        #     rds_recs = check_rds_instances()
-        #     all_recommendations.extend(rds_recs)
-        #     service_summary["RDS"] = len(rds_recs)
-        #     # Add savings from RDS
-        #     for rec in rds_recs:
-        #         savings_str = rec.get("estimated_monthly_savings", "$0")
-        #         savings_val = float(savings_str.replace("$", "").replace(",", ""))
-        #         total_savings += savings_val
+                options = rec.get('recommendationOptions')
+                if options:
+                    best_option = options[0]
+                    savings = (best_option.get('savingsOpportunity') or _EMPTY).get('estimatedMonthlySavings') or _EMPTY
+                    savings_value = float(savings.get('value', 0))
+                    
+                    # Check if recommended type is policy-compliant
+                    recommended_type = best_option.get('instanceType', 'N/A')
+                    if not is_instance_type_allowed(recommended_type, "ec2"):
+                        # Override with policy-compliant type
+                        recommended_type = get_recommended_type(recommended_type, "ec2")
+                    
+                    utilization = rec.get('utilizationMetrics') or _EMPTY
+                    recommendations.append({
+                        "resource_type": "EC2",
+                        "instance_id": instance_id,
+                        "current_instance_type": rec.get('currentInstanceType', 'N/A'),
+                        "recommended_instance_type": recommended_type,
+                        "estimated_monthly_savings": f"${savings_value:.2f}",
+                        "estimated_monthly_savings_usd": savings_value,
+                        "confidence": best_option.get('rank', 'N/A'),
+                        "recommendation_source": "Compute Optimizer",
+                        "utilization_metrics": {
+                            "cpu": f"{(utilization.get('cpuUtilization') or _EMPTY).get('value', 0):.1f}%",
+                            "memory": f"{(utilization.get('memoryUtilization') or _EMPTY).get('value', 0):.1f}%"
+                        }
+                    })
+        except Exception as e:
+            # Compute Optimizer data not available - that's OK, we have policy-based recommendations
+            logger.info(f"Compute Optimizer not available: {str(e)}")
+            pass
         
-        lambda_total_count = 0
+    except Exception as e:
+        raise RuntimeError(f"Error analyzing EC2 instances: {str(e)}") from e
+    
+    return policy_violations, recommendations, running_instances, enrollment_status
+
+
+def _get_rightsizing_recommendations_dict(resource_types: str = "EC2,Lambda,S3", account_ids: str = None, limit: int = 50, force_refresh: bool = False) -> Dict[str, Any]:
+    """Build the rightsizing recommendations result as a dict (see get_rightsizing_recommendations)."""
+    recommendations = []
+    policy_violations = []
+    metrics_recommendations = []
+    running_instances = []
+    enrollment_status = 'N/A'
+    
+    # EC2, Lambda and S3 hit independent services, so run the checks
+    # side by side; results are merged below in a fixed order
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        if 'EC2' in resource_types:
+            jobs['EC2'] = executor.submit(_ec2_path, force_refresh)
         if 'Lambda' in resource_types:
             logger.info("Starting Lambda function check...")
-            lambda_recs, lambda_total_count = check_lambda_functions()
-            logger.info(f"Lambda check returned {len(lambda_recs)} recommendations from {lambda_total_count} functions")
-            all_recommendations.extend(lambda_recs)
-            service_summary["Lambda"] = len(lambda_recs)
-            # Add savings from Lambda
-            for rec in lambda_recs:
-                savings_str = rec.get("estimated_monthly_savings", "$0")
-                savings_val = float(savings_str.replace("$", "").replace(",", ""))
-                total_savings += savings_val
-        
-        s3_total_count = 0
+            jobs['Lambda'] = executor.submit(check_lambda_functions)
         if 'S3' in resource_types:
             logger.info("Starting S3 bucket check...")
-            s3_recs, s3_total_count = check_s3_buckets()
-            logger.info(f"S3 check returned {len(s3_recs)} recommendations from {s3_total_count} buckets")
-            all_recommendations.extend(s3_recs)
-            service_summary["S3"] = len(s3_recs)
-            # Add savings from S3
-            for rec in s3_recs:
-                savings_str = rec.get("estimated_monthly_savings", "$0")
-                savings_val = float(savings_str.replace("$", "").replace(",", ""))
-                total_savings += savings_val
-        
-        # FUTURE ENHANCEMENT - Uncomment to enable EBS optimization
-        # if 'EBS' in resource_types:
-        #     ebs_recs = check_ebs_volumes()
-        #     all_recommendations.extend(ebs_recs)
-        #     service_summary["EBS"] = len(ebs_recs)
-        #     # Add savings from EBS
-        #     for rec in ebs_recs:
-        #         savings_str = rec.get("estimated_monthly_savings", "$0")
-        #         savings_val = float(savings_str.replace("$", "").replace(",", ""))
-        #         total_savings += savings_val
-        
-        # Limit results
-        if limit and len(all_recommendations) > limit:
-            all_recommendations = all_recommendations[:limit]
-        
-        # Build comprehensive resource inventory
-        resource_inventory = {
-            "total_running_instances": len(running_instances) if 'EC2' in resource_types and 'running_instances' in locals() else 0,
-            "total_lambda_functions": lambda_total_count if 'Lambda' in resource_types else 0,
-            "total_s3_buckets": s3_total_count if 'S3' in resource_types else 0,
-            "instances_by_type": {},
-            "policy_compliant_count": 0,
-            "policy_violating_count": 0,
-            "services_analyzed": list(service_summary.keys()),
-            "recommendations_by_service": service_summary
-        }
-        
-        if 'EC2' in resource_types and 'running_instances' in locals():
-            # Count instances by type
-            for instance in running_instances:
-                itype = instance['instance_type']
-                if itype not in resource_inventory["instances_by_type"]:
-                    resource_inventory["instances_by_type"][itype] = 0
-                resource_inventory["instances_by_type"][itype] += 1
-                
-                # Count compliance
-                if is_instance_type_allowed(itype, "ec2"):
-                    resource_inventory["policy_compliant_count"] += 1
-                else:
-                    resource_inventory["policy_violating_count"] += 1
-        
-        result = {
-            "enrollment_status": enrollment_status,
-            "resource_inventory": resource_inventory,
-            "policy_violations": len(policy_violations),
-            "optimizer_recommendations": len(recommendations),
-            "total_recommendations": len(all_recommendations),
-            "estimated_total_monthly_savings": f"${total_savings:.2f}",
-            "recommendations": all_recommendations,
-            "policy_info": {
-                "policy_name": "Company Cost Policy",
-                "enforcement_level": COMPANY_COST_POLICIES.get("metadata", {}).get("enforcement_level", "strict"),
-                "services_checked": list(service_summary.keys())
-            }
+            jobs['S3'] = executor.submit(check_s3_buckets)
+    
+    # Get EC2 recommendations - POLICY-BASED FIRST
+    if 'EC2' in jobs:
+        policy_violations, recommendations, running_instances, enrollment_status = jobs['EC2'].result()
+    
+    # Combine policy violations, metrics recommendations, and optimizer recommendations.
+    # Sources are chained lazily and only copied once the limit is applied.
+    sources = [policy_violations, metrics_recommendations, recommendations]
+    total_savings = sum(rec["estimated_monthly_savings_usd"] for rec in chain.from_iterable(sources))
+    
+    # Check other services based on resource_types parameter
+    service_summary = {"EC2": sum(map(len, sources))}
+    
+    # FUTURE ENHANCEMENT - Uncomment to enable RDS optimization
+    # if 'RDS' in resource_types:
+    #     rds_recs = check_rds_instances()
+    #     sources.append(rds_recs)
+    #     service_summary["RDS"] = len(rds_recs)
+    #     # Add savings from RDS
+    #     total_savings += sum(rec["estimated_monthly_savings_usd"] for rec in rds_recs)
+    
+    lambda_total_count = 0
+    if 'Lambda' in jobs:
+        lambda_recs, lambda_total_count = jobs['Lambda'].result()
+        logger.info(f"Lambda check returned {len(lambda_recs)} recommendations from {lambda_total_count} functions")
+        sources.append(lambda_recs)
+        service_summary["Lambda"] = len(lambda_recs)
+        # Add savings from Lambda
+        total_savings += sum(rec["estimated_monthly_savings_usd"] for rec in lambda_recs)
+    
+    s3_total_count = 0
+    if 'S3' in jobs:
+        s3_recs, s3_total_count = jobs['S3'].result()
+        logger.info(f"S3 check returned {len(s3_recs)} recommendations from {s3_total_count} buckets")
+        sources.append(s3_recs)
+        service_summary["S3"] = len(s3_recs)
+        # Add savings from S3
+        total_savings += sum(rec["estimated_monthly_savings_usd"] for rec in s3_recs)
+    
+    # FUTURE ENHANCEMENT - Uncomment to enable EBS optimization
+    # if 'EBS' in resource_types:
+    #     ebs_recs = check_ebs_volumes()
+    #     sources.append(ebs_recs)
+    #     service_summary["EBS"] = len(ebs_recs)
+    #     # Add savings from EBS
+    #     total_savings += sum(rec["estimated_monthly_savings_usd"] for rec in ebs_recs)
+    
+    # Limit results
+    all_recommendations = list(islice(chain.from_iterable(sources), limit or None))
+    
+    # Build comprehensive resource inventory
+    resource_inventory = {
+        "total_running_instances": len(running_instances),
+        "total_lambda_functions": lambda_total_count if 'Lambda' in resource_types else 0,
+        "total_s3_buckets": s3_total_count if 'S3' in resource_types else 0,
+        "instances_by_type": {},
+        "policy_compliant_count": 0,
+        "policy_violating_count": 0,
+        "services_analyzed": list(service_summary.keys()),
+        "recommendations_by_service": service_summary
+    }
+    
+    if running_instances:
+        # Count instances by type, then check compliance once per distinct type
+        instances_by_type = Counter(instance['instance_type'] for instance in running_instances)
+        resource_inventory["instances_by_type"] = dict(instances_by_type)
+        allowed_types = batch_check(instances_by_type, "ec2")
+        for itype, count in instances_by_type.items():
+            if allowed_types[itype]:
+                resource_inventory["policy_compliant_count"] += count
+            else:
+                resource_inventory["policy_violating_count"] += count
+    
+    result = {
+        "enrollment_status": enrollment_status,
+        "resource_inventory": resource_inventory,
+        "policy_violations": len(policy_violations),
+        "optimizer_recommendations": len(recommendations),
+        "total_recommendations": len(all_recommendations),
+        "estimated_total_monthly_savings": f"${total_savings:.2f}",
+        "recommendations": all_recommendations,
+        "policy_info": {
+            "policy_name": "Company Cost Policy",
+            "enforcement_level": COMPANY_COST_POLICIES.get("metadata", {}).get("enforcement_level", "strict"),
+            "services_checked": list(service_summary.keys())
         }
-        
-        # Build summary based on what was analyzed
-        services_analyzed_str = ', '.join(service_summary.keys())
-        total_resources_analyzed = sum(service_summary.values())
-        
-        if not all_recommendations:
-            result["message"] = f"Excellent! All your {services_analyzed_str} resources comply with company cost policies. No optimization recommendations at this time."
-            result["compliance_status"] = "compliant"
-            result["summary"] = f"Analyzed {services_analyzed_str} resources. All are policy-compliant."
+    }
+    
+    # Build summary based on what was analyzed
+    services_analyzed_str = ', '.join(service_summary.keys())
+    total_resources_analyzed = sum(service_summary.values())
+    
+    if not all_recommendations:
+        result["message"] = f"Excellent! All your {services_analyzed_str} resources comply with company cost policies. No optimization recommendations at this time."
+        result["compliance_status"] = "compliant"
+        result["summary"] = f"Analyzed {services_analyzed_str} resources. All are policy-compliant."
+    else:
+        if policy_violations:
+            result["message"] = f"Found {len(all_recommendations)} optimization opportunity(ies) across {services_analyzed_str}."
+            result["compliance_status"] = "violations_detected"
+            result["summary"] = f"Analyzed {services_analyzed_str} resources. Found {len(all_recommendations)} recommendation(s)."
         else:
-            if policy_violations:
-                result["message"] = f"Found {len(all_recommendations)} optimization opportunity(ies) across {services_analyzed_str}."
-                result["compliance_status"] = "violations_detected"
-                result["summary"] = f"Analyzed {services_analyzed_str} resources. Found {len(all_recommendations)} recommendation(s)."
-            else:
-                result["message"] = f"Found {len(all_recommendations)} optimization opportunities across {services_analyzed_str} based on usage metrics."
-                result["compliance_status"] = "compliant_with_optimizations"
-                result["summary"] = f"Analyzed {services_analyzed_str} resources. Found {len(all_recommendations)} metrics-based optimization(s)."
-        
-        return json.dumps(result, indent=2)
-        
-    except Exception as e:
-        return f"Error getting rightsizing recommendations: {str(e)}"
+            result["message"] = f"Found {len(all_recommendations)} optimization opportunities across {services_analyzed_str} based on usage metrics."
+            result["compliance_status"] = "compliant_with_optimizations"
+            result["summary"] = f"Analyzed {services_analyzed_str} resources. Found {len(all_recommendations)} metrics-based optimization(s)."
+    
+    return result
 
 
+@lru_cache(maxsize=1)
 def _configure_region() -> str | None:
     model_region = (
         os.getenv("BEDROCK_MODEL_REGION")
@@ -986,6 +1267,55 @@ def _configure_region() -> str | None:
     return model_region
 
 
+_SYSTEM_PROMPT = (
+    "You are SpendOptimo, an advanced FinOps assistant specialized in AWS cost optimization and financial operations. "
+    "You have access to powerful tools for analyzing AWS costs, detecting anomalies, and executing automated optimization workflows. "
+    "\n\nYour capabilities include:\n"
+    "- analyze_aws_costs: Analyze AWS spending patterns, trends, and identify cost drivers\n"
+    "- get_cost_anomalies: Detect unusual spending patterns and cost anomalies\n"
+    "- get_rightsizing_recommendations: Get cost optimization recommendations for EC2 instances, Lambda functions, and S3 buckets based on company policies and AWS optimization services\n"
+    "- execute_deploy_and_optimize_workflow: Execute a complete optimization workflow that discovers existing instances, analyzes them, and applies rightsizing\n"
+    "- execute_rightsizing_workflow: Execute rightsizing workflow on existing resources\n"
+    "- calculator: Perform mathematical calculations\n"
+    "\n\nGuidelines for responding:\n"
+    "- When users ask about cost analysis, trends, or anomalies, use the appropriate tools to provide data-driven insights. DO NOT show any buttons for these queries.\n"
+    "- When users ask about rightsizing, optimization, instance recommendations, or cost savings opportunities:\n"
+    "  1. ALWAYS use get_rightsizing_recommendations to check company policies and resource compliance\n"
+    "  2. IMPORTANT - Set resource_types parameter based on user query:\n"
+    "     - If asking about EC2/instances only -> resource_types='EC2'\n"
+    "     - If asking about Lambda functions only -> resource_types='Lambda'\n"
+    "     - If asking about S3 buckets only -> resource_types='S3'\n"
+    "     - If asking about all services -> resource_types='EC2,Lambda,S3'\n"
+    "  3. Write a CONVERSATIONAL, well-explained response (not just bullet points). Include:\n"
+    "     - Opening statement about what you found\n"
+    "     - Resource inventory in natural language (e.g., 'I found 5 running EC2 instances...')\n"
+    "     - Policy violations explained clearly with context\n"
+    "     - Compute Optimizer insights if available\n"
+    "     - Total estimated savings\n"
+    "     - Clear next steps\n"
+    "  3. Use markdown formatting (headers, bold, lists) to make it readable\n"
+    "  4. CRITICAL: You MUST end your response with these EXACT markers:\n\n"
+    "     [RECOMMENDATIONS_JSON]\n"
+    "     <paste the full recommendations JSON array from get_rightsizing_recommendations tool result here>\n"
+    "     [/RECOMMENDATIONS_JSON]\n\n"
+    "     [BUTTON:Execute Recommendations]\n\n"
+    "     These markers must appear for EVERY rightsizing query. If no recommendations, use empty array [].\n"
+    "- Company cost policies are the PRIMARY source of recommendations. Compute Optimizer metrics provide additional insights.\n"
+    "- If resources violate company policy (e.g., R5 instances when only T3 allowed), explain WHY the policy exists and what the impact is.\n"
+    "- Even when everything is compliant, write a positive, detailed response explaining what was checked and why it's good.\n"
+    "- When execute_rightsizing_workflow is called, provide an intelligent response based on the resource types being optimized:\n"
+    "  - For EC2: Mention stop/modify/restart instance workflow\n"
+    "  - For Lambda: Mention updating function configuration (memory/concurrency)\n"
+    "  - For S3: Mention configuring lifecycle policies for buckets\n"
+    "  - For mixed services: List all actions being performed\n"
+    "  - ALWAYS include the execution ID and estimated completion time\n"
+    "  - NEVER use static messages - tailor response to actual recommendations\n"
+    "- DO NOT show the 'Deploy and Optimize Demo' button unless specifically requested by the user.\n"
+    "- Be conversational, helpful, and specific. Avoid overly technical jargon.\n"
+    "- Always explain the business impact of recommendations."
+)
+
+
 def _build_agent() -> Agent:
     model_id = os.getenv("BEDROCK_MODEL_ID", "amazon.nova-pro-v1:0")
     model_region = _configure_region()
@@ -995,62 +1325,18 @@ def _build_agent() -> Agent:
         model_id=model_id,
     )
 
-    system_prompt = (
-        "You are SpendOptimo, an advanced FinOps assistant specialized in AWS cost optimization and financial operations. "
-        "You have access to powerful tools for analyzing AWS costs, detecting anomalies, and executing automated optimization workflows. "
-        "\n\nYour capabilities include:\n"
-        "- analyze_aws_costs: Analyze AWS spending patterns, trends, and identify cost drivers\n"
-        "- get_cost_anomalies: Detect unusual spending patterns and cost anomalies\n"
-        "- get_rightsizing_recommendations: Get cost optimization recommendations for EC2 instances, Lambda functions, and S3 buckets based on company policies and AWS optimization services\n"
-               "- execute_deploy_and_optimize_workflow: Execute a complete optimization workflow that discovers existing instances, analyzes them, and applies rightsizing\n"
-        "- execute_rightsizing_workflow: Execute rightsizing workflow on existing resources\n"
-        "- calculator: Perform mathematical calculations\n"
-        "\n\nGuidelines for responding:\n"
-        "- When users ask about cost analysis, trends, or anomalies, use the appropriate tools to provide data-driven insights. DO NOT show any buttons for these queries.\n"
-        "- When users ask about rightsizing, optimization, instance recommendations, or cost savings opportunities:\n"
-        "  1. ALWAYS use get_rightsizing_recommendations to check company policies and resource compliance\n"
-        "  2. IMPORTANT - Set resource_types parameter based on user query:\n"
-        "     - If asking about EC2/instances only -> resource_types='EC2'\n"
-        "     - If asking about Lambda functions only -> resource_types='Lambda'\n"
-        "     - If asking about S3 buckets only -> resource_types='S3'\n"
-        "     - If asking about all services -> resource_types='EC2,Lambda,S3'\n"
-        "  3. Write a CONVERSATIONAL, well-explained response (not just bullet points). Include:\n"
-        "     - Opening statement about what you found\n"
-        "     - Resource inventory in natural language (e.g., 'I found 5 running EC2 instances...')\n"
-        "     - Policy violations explained clearly with context\n"
-        "     - Compute Optimizer insights if available\n"
-        "     - Total estimated savings\n"
-        "     - Clear next steps\n"
-        "  3. Use markdown formatting (headers, bold, lists) to make it readable\n"
-        "  4. CRITICAL: You MUST end your response with these EXACT markers:\n\n"
-        "     [RECOMMENDATIONS_JSON]\n"
-        "     <paste the full recommendations JSON array from get_rightsizing_recommendations tool result here>\n"
-        "     [/RECOMMENDATIONS_JSON]\n\n"
-        "     [BUTTON:Execute Recommendations]\n\n"
-        "     These markers must appear for EVERY rightsizing query. If no recommendations, use empty array [].\n"
-        "- Company cost policies are the PRIMARY source of recommendations. Compute Optimizer metrics provide additional insights.\n"
-        "- If resources violate company policy (e.g., R5 instances when only T3 allowed), explain WHY the policy exists and what the impact is.\n"
-        "- Even when everything is compliant, write a positive, detailed response explaining what was checked and why it's good.\n"
-        "- When execute_rightsizing_workflow is called, provide an intelligent response based on the resource types being optimized:\n"
-        "  - For EC2: Mention stop/modify/restart instance workflow\n"
-        "  - For Lambda: Mention updating function configuration (memory/concurrency)\n"
-        "  - For S3: Mention configuring lifecycle policies for buckets\n"
-        "  - For mixed services: List all actions being performed\n"
-        "  - ALWAYS include the execution ID and estimated completion time\n"
-        "  - NEVER use static messages - tailor response to actual recommendations\n"
-        "- DO NOT show the 'Deploy and Optimize Demo' button unless specifically requested by the user.\n"
-        "- Be conversational, helpful, and specific. Avoid overly technical jargon.\n"
-        "- Always explain the business impact of recommendations."
-    )
     return Agent(
         model=model,
         tools=[calculator, analyze_aws_costs, get_cost_anomalies, get_rightsizing_recommendations, execute_rightsizing_workflow, execute_deploy_and_optimize_workflow],
-        system_prompt=system_prompt,
+        system_prompt=_SYSTEM_PROMPT,
     )
 
 
 _agent = _build_agent()
 
+# Recommendations block the system prompt asks the model to append to rightsizing answers
+_REC_RE = re.compile(r'\[RECOMMENDATIONS_JSON\](.*?)\[/RECOMMENDATIONS_JSON\]', re.DOTALL)
+
 
 @app.entrypoint
 def spendoptimo_agent(request: RequestContext) -> Dict[str, Any]:
@@ -1067,15 +1353,15 @@ def spendoptimo_agent(request: RequestContext) -> Dict[str, Any]:
     
     # Extract recommendations from the text between markers
     recommendations = []
-    import re
     
-    rec_match = re.search(r'\[RECOMMENDATIONS_JSON\](.*?)\[/RECOMMENDATIONS_JSON\]', text, re.DOTALL)
+    # Most responses carry no block; a substring test is far cheaper than a failed regex scan
+    rec_match = _REC_RE.search(text) if "[RECOMMENDATIONS_JSON]" in text else None
     if rec_match:
         try:
             rec_json = rec_match.group(1).strip()
-            recommendations = json.loads(rec_json)
-            if isinstance(recommendations, dict) and 'recommendations' in recommendations:
-                recommendations = recommendations['recommendations']
+            rec_obj = _json_loads(rec_json)
+            # JSON objects always decode to a plain dict, so an exact type check suffices
+            recommendations = rec_obj['recommendations'] if type(rec_obj) is dict and 'recommendations' in rec_obj else rec_obj
             logger.info(f"Extracted {len(recommendations)} recommendations from response")
         except Exception as e:
             logger.warning(f"Failed to parse recommendations JSON: {e}")
@@ -1086,10 +1372,14 @@ def spendoptimo_agent(request: RequestContext) -> Dict[str, Any]:
     deploy_button = "[BUTTON:Deploy and Optimize Demo]"
     
     if rightsizing_button in text:
-        # Remove the button marker and recommendations JSON from the message
-        clean_message = text.replace(rightsizing_button, "").strip()
+        # Remove the button marker and recommendations JSON from the message;
+        # the JSON block is cut out by its match offsets rather than searched for again
         if rec_match:
-            clean_message = clean_message.replace(rec_match.group(0), "").strip()
+            block_start, block_end = rec_match.span()
+            clean_message = text[:block_start] + text[block_end:]
+        else:
+            clean_message = text
+        clean_message = clean_message.replace(rightsizing_button, "", 1).strip()
         
         # Only include button if there are actual recommendations
         if recommendations and len(recommendations) > 0:
@@ -1110,7 +1400,7 @@ def spendoptimo_agent(request: RequestContext) -> Dict[str, Any]:
             }
     elif deploy_button in text:
         # Remove the button marker from the message
-        clean_message = text.replace(deploy_button, "").strip()
+        clean_message = text.replace(deploy_button, "", 1).strip()
         
         return {
             "brand": "SpendOptimo",
@@ -8,27 +8,98 @@ via the AgentCore Gateway to perform cost optimization actions.
 import boto3
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+import time
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# StopInstances/StartInstances accept up to 1000 instance IDs per call
+_EC2_BATCH_SIZE = 1000
+
+# How long Compute Optimizer and anomaly results are reused between workflow runs
+_CACHE_TTL_SECONDS = 300
+
+# boto3 clients shared by every SpendOptimoAutomation instance. The pool is
+# sized for the concurrent ModifyInstanceAttribute calls in rightsizing.
+_CLIENT_CONFIG = Config(max_pool_connections=50, retries={'mode': 'adaptive'})
+_CLIENT_CACHE: Dict[str, Any] = {}
+
+
+def _client(service_name: str):
+    """Return the shared boto3 client for service_name, creating it on first use."""
+    client = _CLIENT_CACHE.get(service_name)
+    if client is None:
+        client = _CLIENT_CACHE[service_name] = boto3.client(service_name, config=_CLIENT_CONFIG)
+    return client
+
+
+# Shared read-only default for missing nested fields, so lookups don't allocate
+_EMPTY: Dict[str, Any] = {}
+
+
+def _first_option(recommendation: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a Compute Optimizer recommendation's top-ranked option (or an empty dict)."""
+    options = recommendation.get('recommendationOptions')
+    return options[0] if options else _EMPTY
+
+
+def _option_savings(option: Dict[str, Any]) -> float:
+    """Return the estimated monthly savings of a recommendation option as a float."""
+    opportunity = option.get('savingsOpportunity') or _EMPTY
+    return float((opportunity.get('estimatedMonthlySavings') or _EMPTY).get('value') or 0)
+
+
+def _rightsizing_failure(instance_id: str, stage: str, error: Exception) -> Dict[str, Any]:
+    """Describe an instance that could not be rightsized and the step that failed."""
+    return {
+        "type": "rightsizing",
+        "instance": instance_id,
+        "stage": stage,
+        "error": str(error),
+        "status": "failed"
+    }
+
+
+def _is_high_impact(anomaly: Dict[str, Any]) -> bool:
+    """Return True for anomalies with more than $100 of total impact."""
+    impact = anomaly.get('impact')
+    total_impact = impact.get('total_impact') if impact else None
+    # Cost Explorer returns numbers; only coerce if a string slips through
+    if isinstance(total_impact, str):
+        total_impact = float(total_impact)
+    return total_impact is not None and total_impact > 100
+
+
 class SpendOptimoAutomation:
     """Main automation class for FinOps workflows."""
     
     def __init__(self):
-        self.ec2_client = boto3.client('ec2')
-        self.ce_client = boto3.client('ce')
-        self.compute_optimizer = boto3.client('compute-optimizer')
-        self.sfn_client = boto3.client('stepfunctions')
+        self.ec2_client = _client('ec2')
+        self.ce_client = _client('ce')
+        self.compute_optimizer = _client('compute-optimizer')
+        self.sfn_client = _client('stepfunctions')
+        self._cache: Dict[str, Any] = {}
+    
+    def _cached(self, key: str, fetch):
+        """Return fetch() memoized for _CACHE_TTL_SECONDS; failures are not cached."""
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+        value = fetch()
+        self._cache[key] = (now + _CACHE_TTL_SECONDS, value)
+        return value
     
     def execute_rightsizing_workflow(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Execute automated rightsizing workflow."""
         try:
             logger.info("Starting rightsizing workflow")
             
-            # Get rightsizing recommendations
-            recommendations = self._get_rightsizing_recommendations()
+            # Get high-confidence rightsizing recommendations
+            recommendations = self._get_rightsizing_recommendations(min_confidence=4)
             
             if not recommendations:
                 return {
@@ -37,21 +108,18 @@ class SpendOptimoAutomation:
                     "actions_taken": []
                 }
             
-            actions_taken = []
-            
-            # Process high-confidence recommendations
-            for rec in recommendations:
-                if rec.get('confidence', 0) >= 4:  # High confidence
-                    action = self._apply_rightsizing_recommendation(rec, context)
-                    if action:
-                        actions_taken.append(action)
+            actions_taken, failures, processed = self._apply_rightsizing_recommendations(recommendations, context)
             
-            return {
-                "status": "completed",
-                "message": f"Processed {len(recommendations)} recommendations",
+            result = {
+                "status": "completed_with_errors" if failures else "completed",
+                "message": f"Processed {processed} recommendations",
                 "actions_taken": actions_taken,
-                "potential_savings": sum(float(a.get('savings', 0)) for a in actions_taken)
+                "potential_savings": sum(a['savings'] for a in actions_taken)
             }
+            if failures:
+                result["message"] += f"; {len(failures)} instance step(s) failed"
+                result["failures"] = failures
+            return result
             
         except Exception as e:
             logger.error(f"Rightsizing workflow failed: {str(e)}")
@@ -85,7 +153,7 @@ class SpendOptimoAutomation:
                 "status": "completed",
                 "message": f"Identified {len(opportunities)} optimization opportunities",
                 "actions_taken": actions_taken,
-                "total_potential_savings": sum(float(a.get('savings', 0)) for a in actions_taken)
+                "total_potential_savings": sum(a.get('savings', 0.0) for a in actions_taken)
             }
             
         except Exception as e:
@@ -114,11 +182,10 @@ class SpendOptimoAutomation:
             actions_taken = []
             
             # Respond to high-impact anomalies
-            for anomaly in anomalies:
-                if float(anomaly.get('impact', {}).get('total_impact', 0)) > 100:  # $100+ impact
-                    action = self._respond_to_anomaly(anomaly, context)
-                    if action:
-                        actions_taken.append(action)
+            for anomaly in filter(_is_high_impact, anomalies):
+                action = self._respond_to_anomaly(anomaly, context)
+                if action:
+                    actions_taken.append(action)
             
             return {
                 "status": "completed",
@@ -134,72 +201,158 @@ class SpendOptimoAutomation:
                 "actions_taken": []
             }
     
-    def _get_rightsizing_recommendations(self) -> List[Dict[str, Any]]:
-        """Get rightsizing recommendations from Compute Optimizer."""
+    def _get_rightsizing_recommendations(self, min_confidence: int = 0) -> List[Dict[str, Any]]:
+        """Get rightsizing recommendations from Compute Optimizer, optionally only those at or above min_confidence."""
+        def fetch():
+            # No boto3 paginator exists for this call, so follow nextToken by hand
+            recommendations = []
+            params = {}
+            while True:
+                response = self.compute_optimizer.get_ec2_instance_recommendations(**params)
+                recommendations.extend(response.get('instanceRecommendations', []))
+                if not response.get('nextToken'):
+                    return recommendations
+                params['nextToken'] = response['nextToken']
+        
         try:
-            response = self.compute_optimizer.get_ec2_instance_recommendations()
-            return response.get('instanceRecommendations', [])
+            recommendations = self._cached('rightsizing_recommendations', fetch)
         except Exception as e:
             logger.error(f"Failed to get rightsizing recommendations: {str(e)}")
             return []
+        
+        if min_confidence:
+            return [rec for rec in recommendations if rec.get('confidence', 0) >= min_confidence]
+        return recommendations
     
-    def _apply_rightsizing_recommendation(self, recommendation: Dict[str, Any], context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Apply a rightsizing recommendation if approved."""
-        try:
-            # Check if auto-apply is enabled in context
-            if not context.get('auto_apply', False):
-                return {
+    def _apply_rightsizing_recommendations(self, recommendations: List[Dict[str, Any]], context: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """Apply rightsizing recommendations if approved.
+        
+        Instances are stopped, waited on and restarted in batches, so the
+        workflow waits for EC2 once rather than once per instance. Returns
+        the actions taken, the per-instance failures and how many
+        recommendations were actually processed.
+        """
+        # Check if auto-apply is enabled in context
+        if not context.get('auto_apply', False):
+            actions = []
+            for rec in recommendations:
+                option = _first_option(rec)
+                actions.append({
                     "type": "recommendation",
-                    "instance": recommendation.get('instanceArn', ''),
-                    "current_type": recommendation.get('currentInstanceType', ''),
-                    "recommended_type": recommendation.get('recommendationOptions', [{}])[0].get('instanceType', ''),
-                    "savings": recommendation.get('recommendationOptions', [{}])[0].get('savingsOpportunity', {}).get('estimatedMonthlySavings', {}).get('value', 0),
+                    "instance": rec.get('instanceArn', ''),
+                    "current_type": rec.get('currentInstanceType', ''),
+                    "recommended_type": option.get('instanceType', ''),
+                    "savings": _option_savings(option),
                     "status": "pending_approval"
-                }
-            
-            # Auto-apply if enabled
-            instance_id = recommendation.get('instanceArn', '').split('/')[-1]
-            new_instance_type = recommendation.get('recommendationOptions', [{}])[0].get('instanceType', '')
-            
-            # Stop instance, modify type, start instance
-            self.ec2_client.stop_instances(InstanceIds=[instance_id])
-            
-            # Wait for instance to stop
-            waiter = self.ec2_client.get_waiter('instance_stopped')
-            waiter.wait(InstanceIds=[instance_id])
-            
-            # Modify instance type
-            self.ec2_client.modify_instance_attribute(
-                InstanceId=instance_id,
-                InstanceType={'Value': new_instance_type}
-            )
-            
-            # Start instance
-            self.ec2_client.start_instances(InstanceIds=[instance_id])
-            
+                })
+            return actions, [], len(actions)
+        
+        if not recommendations:
+            return [], [], 0
+        
+        # Auto-apply if enabled. Only stop instances whose change can succeed:
+        # an empty ID would fail the batch calls, and a missing or unchanged
+        # target type would fail (or no-op) the modify after the downtime.
+        targets = {}
+        for rec in recommendations:
+            instance_id = (rec.get('instanceArn') or '').rsplit('/', 1)[-1]
+            new_instance_type = _first_option(rec).get('instanceType')
+            if not instance_id:
+                logger.warning("Skipping rightsizing recommendation without an instance ARN")
+            elif not new_instance_type:
+                logger.warning(f"Skipping rightsizing recommendation for {instance_id} without a target instance type")
+            elif new_instance_type == rec.get('currentInstanceType'):
+                logger.warning(f"Skipping rightsizing recommendation for {instance_id}: already {new_instance_type}")
+            else:
+                targets[instance_id] = rec
+        if not targets:
+            return [], [], 0
+        
+        failures: List[Dict[str, Any]] = []
+        waiter = self.ec2_client.get_waiter('instance_stopped')
+        
+        # Stop instances, then wait for all of them once. Either step drops
+        # only the IDs that fail and carries on with the rest.
+        stopped = self._for_each_batch(
+            'stop', list(targets), failures,
+            lambda ids: self.ec2_client.stop_instances(InstanceIds=ids)
+        )
+        ready = self._for_each_batch(
+            'wait_stopped', stopped, failures,
+            lambda ids: waiter.wait(InstanceIds=ids, WaiterConfig={'Delay': 15, 'MaxAttempts': 40})
+        )
+        
+        # Modify instance types - there is no batch API, so issue them concurrently
+        def modify(instance_id: str) -> Optional[Dict[str, Any]]:
+            rec = targets[instance_id]
+            option = _first_option(rec)
+            new_instance_type = option.get('instanceType', '')
+            try:
+                self.ec2_client.modify_instance_attribute(
+                    InstanceId=instance_id,
+                    InstanceType={'Value': new_instance_type}
+                )
+            except Exception as e:
+                logger.error(f"Failed to apply rightsizing recommendation to {instance_id}: {str(e)}")
+                failures.append(_rightsizing_failure(instance_id, 'modify', e))
+                return None
             return {
                 "type": "rightsizing",
                 "instance": instance_id,
-                "old_type": recommendation.get('currentInstanceType', ''),
+                "old_type": rec.get('currentInstanceType', ''),
                 "new_type": new_instance_type,
-                "savings": recommendation.get('recommendationOptions', [{}])[0].get('savingsOpportunity', {}).get('estimatedMonthlySavings', {}).get('value', 0),
+                "savings": _option_savings(option),
                 "status": "applied"
             }
-            
-        except Exception as e:
-            logger.error(f"Failed to apply rightsizing recommendation: {str(e)}")
-            return None
+        
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            actions_taken = [action for action in executor.map(modify, ready) if action]
+        
+        # Start every instance we stopped, including any whose wait or modify failed
+        self._for_each_batch(
+            'start', stopped, failures,
+            lambda ids: self.ec2_client.start_instances(InstanceIds=ids)
+        )
+        
+        return actions_taken, failures, len(targets)
+    
+    def _for_each_batch(self, stage: str, instance_ids: List[str], failures: List[Dict[str, Any]], call) -> List[str]:
+        """Run call over instance_ids in batches, retrying a failed batch one ID at a time.
+        
+        Returns the IDs call succeeded for; the others are appended to failures.
+        """
+        succeeded = []
+        for i in range(0, len(instance_ids), _EC2_BATCH_SIZE):
+            batch = instance_ids[i:i + _EC2_BATCH_SIZE]
+            try:
+                call(batch)
+                succeeded.extend(batch)
+                continue
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Rightsizing {stage} failed for {batch[0]}: {str(e)}")
+                    failures.append(_rightsizing_failure(batch[0], stage, e))
+                    continue
+                logger.warning(f"Rightsizing {stage} failed for a batch of {len(batch)}, retrying per instance: {str(e)}")
+            for instance_id in batch:
+                try:
+                    call([instance_id])
+                    succeeded.append(instance_id)
+                except Exception as e:
+                    logger.error(f"Rightsizing {stage} failed for {instance_id}: {str(e)}")
+                    failures.append(_rightsizing_failure(instance_id, stage, e))
+        return succeeded
     
     def _analyze_current_costs(self) -> Dict[str, Any]:
         """Analyze current AWS costs."""
         try:
-            end_date = datetime.now().date()
+            end_date = date.today()
             start_date = end_date - timedelta(days=30)
             
             response = self.ce_client.get_cost_and_usage(
                 TimePeriod={
-                    'Start': start_date.strftime('%Y-%m-%d'),
-                    'End': end_date.strftime('%Y-%m-%d')
+                    'Start': start_date.isoformat(),
+                    'End': end_date.isoformat()
                 },
                 Granularity='MONTHLY',
                 Metrics=['BlendedCost'],
@@ -234,18 +387,26 @@ class SpendOptimoAutomation:
     
     def _get_recent_anomalies(self) -> List[Dict[str, Any]]:
         """Get recent cost anomalies."""
-        try:
-            end_date = datetime.now().date()
+        def fetch():
+            end_date = date.today()
             start_date = end_date - timedelta(days=7)
             
-            response = self.ce_client.get_anomalies(
-                DateInterval={
-                    'Start': start_date.strftime('%Y-%m-%d'),
-                    'End': end_date.strftime('%Y-%m-%d')
+            anomalies = []
+            params = {
+                'DateInterval': {
+                    'Start': start_date.isoformat(),
+                    'End': end_date.isoformat()
                 }
-            )
-            
-            return response.get('Anomalies', [])
+            }
+            while True:
+                response = self.ce_client.get_anomalies(**params)
+                anomalies.extend(response.get('Anomalies', []))
+                if not response.get('NextPageToken'):
+                    return anomalies
+                params['NextPageToken'] = response['NextPageToken']
+        
+        try:
+            return self._cached('recent_anomalies', fetch)
         except Exception as e:
             logger.error(f"Failed to get anomalies: {str(e)}")
             return []
@@ -263,20 +424,23 @@ class SpendOptimoAutomation:
 # Global automation instance
 automation = SpendOptimoAutomation()
 
+# Workflow type -> handler on the global automation instance
+_DISPATCH = {
+    "rightsizing": automation.execute_rightsizing_workflow,
+    "cost_optimization": automation.execute_cost_optimization_workflow,
+    "anomaly_response": automation.execute_anomaly_response_workflow,
+}
+
 def execute_workflow(workflow_type: str, context: Dict[str, Any]) -> Dict[str, Any]:
     """Execute a specific workflow type."""
-    if workflow_type == "rightsizing":
-        return automation.execute_rightsizing_workflow(context)
-    elif workflow_type == "cost_optimization":
-        return automation.execute_cost_optimization_workflow(context)
-    elif workflow_type == "anomaly_response":
-        return automation.execute_anomaly_response_workflow(context)
-    else:
+    handler = _DISPATCH.get(workflow_type)
+    if handler is None:
         return {
             "status": "failed",
             "message": f"Unknown workflow type: {workflow_type}",
             "actions_taken": []
         }
+    return handler(context)
 
 
 
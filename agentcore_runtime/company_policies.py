@@ -6,6 +6,9 @@ for various AWS services. These policies are used by the SpendOptimo agent
 to make recommendations even when CloudWatch metrics are insufficient.
 """
 
+import re
+from functools import lru_cache
+
 COMPANY_COST_POLICIES = {
     "metadata": {
         "company_name": "SpendOptimo Demo Corp",
@@ -143,6 +146,7 @@ COMPANY_COST_POLICIES = {
 }
 
 
+@lru_cache(maxsize=None)
 def get_policy(service: str) -> dict:
     """Get policy for a specific service."""
     return COMPANY_COST_POLICIES.get(service, {})
@@ -153,43 +157,87 @@ def get_all_policies() -> dict:
     return COMPANY_COST_POLICIES
 
 
+@lru_cache(maxsize=None)
+def compile_glob_patterns(patterns: tuple) -> re.Pattern:
+    """Compile glob patterns (e.g. "r5.*") into one regex for use with fullmatch."""
+    if not patterns:
+        return re.compile(r"(?!)")  # Matches nothing
+    return re.compile("|".join(re.escape(pattern).replace(r"\*", ".*") for pattern in patterns))
+
+
+def _split_glob_patterns(patterns) -> tuple:
+    """Split glob patterns into (exact names, prefixes, regex for the rest).
+
+    "t3.large" is an exact name and "r5.*" a prefix ("r5."); only patterns with
+    a "*" anywhere but the end need the regex, which is None when there are none.
+    """
+    exact = frozenset(p for p in patterns if "*" not in p)
+    prefixes = tuple(p[:-1] for p in patterns if p.endswith("*") and "*" not in p[:-1])
+    other = tuple(p for p in patterns if "*" in p[:-1])
+    return exact, prefixes, compile_glob_patterns(other) if other else None
+
+
+def _default_recommended_type(recommended: tuple):
+    """Pick the type get_recommended_type suggests: t3.medium if allowed, else the first."""
+    if not recommended:
+        return None
+    # Return the medium size as a reasonable default
+    return "t3.medium" if "t3.medium" in recommended else recommended[0]
+
+
+# Per-service lookup tables flattened once at import, so the accessors below
+# are a single dict lookup rather than a chain of policy.get() calls
+_DISALLOWED = {
+    service: _split_glob_patterns(policy["disallowed_instance_types"])
+    for service, policy in COMPANY_COST_POLICIES.items()
+    if policy.get("disallowed_instance_types")
+}
+_RECOMMENDED = {
+    service: tuple(policy.get("recommended_types", ()))
+    for service, policy in COMPANY_COST_POLICIES.items()
+}
+_RECOMMENDED_DEFAULT = {
+    service: _default_recommended_type(recommended)
+    for service, recommended in _RECOMMENDED.items()
+    if recommended
+}
+_DEFAULT_RATIONALE = "Company cost optimization policy"
+_RATIONALE = {
+    service: policy.get("rationale", _DEFAULT_RATIONALE)
+    for service, policy in COMPANY_COST_POLICIES.items()
+}
+
+
+@lru_cache(maxsize=4096)
 def is_instance_type_allowed(instance_type: str, service: str = "ec2") -> bool:
     """Check if an instance type is allowed by policy."""
-    import re
-    
-    policy = get_policy(service)
-    if not policy:
+    disallowed = _DISALLOWED.get(service)
+    if disallowed is None:
         return True
     
-    disallowed = policy.get("disallowed_instance_types", [])
-    
-    for pattern in disallowed:
-        # Convert glob pattern to regex
-        regex_pattern = pattern.replace(".", r"\.").replace("*", ".*")
-        if re.match(f"^{regex_pattern}$", instance_type):
-            return False
-    
-    return True
+    exact, prefixes, other = disallowed
+    if instance_type in exact or instance_type.startswith(prefixes):
+        return False
+    return other is None or other.fullmatch(instance_type) is None
 
 
+def batch_check(instance_types, service: str = "ec2") -> dict:
+    """Check many instance types at once and return {instance_type: allowed}.
+
+    Each distinct type is evaluated once, so a fleet of thousands of instances
+    costs only as many checks as it has distinct types.
+    """
+    return {instance_type: is_instance_type_allowed(instance_type, service) for instance_type in set(instance_types)}
+
+
+@lru_cache(maxsize=4096)
 def get_recommended_type(current_type: str, service: str = "ec2") -> str:
     """Get recommended instance type based on policy."""
-    policy = get_policy(service)
-    if not policy:
-        return current_type
-    
-    recommended = policy.get("recommended_types", [])
-    if recommended:
-        # Return the medium size as a reasonable default
-        if "t3.medium" in recommended:
-            return "t3.medium"
-        return recommended[0] if recommended else current_type
-    
-    return current_type
+    return _RECOMMENDED_DEFAULT.get(service) or current_type
 
 
+@lru_cache(maxsize=None)
 def get_policy_rationale(service: str) -> str:
     """Get the rationale for a service's policy."""
-    policy = get_policy(service)
-    return policy.get("rationale", "Company cost optimization policy")
+    return _RATIONALE.get(service, _DEFAULT_RATIONALE)
 
@@ -9,6 +9,7 @@ from __future__ import annotations
 
 import json
 import logging
+import time
 from dataclasses import dataclass
 from typing import Any, Dict, Optional, Sequence
 
@@ -44,6 +45,9 @@ except ImportError:  # pragma: no cover - fall back for local mock
     ManagedAgentClient = None  # type: ignore
 
 
+PARAMETER_CACHE_TTL_SECONDS = 300
+
+
 @dataclass
 class AgentCoreConfig:
     """Configuration references for the SpendOptimo AgentCore deployment."""
@@ -66,13 +70,20 @@ class AgentCoreGateway:
         self._ssm = boto3.client("ssm", region_name=config.region_name)
         self._control = boto3.client("bedrock-agentcore-control", region_name=config.region_name)
         self._http = HttpBedrockAgentCoreClient(config.region_name)
+        self._parameters: Dict[str, tuple] = {}
 
     def _fetch_parameter(self, name: str) -> str:
+        # Every invoke reads the same handful of parameters; keep them briefly
+        now = time.monotonic()
+        cached = self._parameters.get(name)
+        if cached and now - cached[0] < PARAMETER_CACHE_TTL_SECONDS:
+            return cached[1]
         logger.debug("Fetching SSM parameter %s", name)
         response = self._ssm.get_parameter(Name=name, WithDecryption=True)
         value = response.get("Parameter", {}).get("Value")
         if not value:
             raise RuntimeError(f"SSM parameter {name} is empty")
+        self._parameters[name] = (now, value)
         return value
 
     def fetch_metadata(self) -> Dict[str, str]:
@@ -2,23 +2,66 @@
 SpendOptimo API Lambda handler.
 """
 
-import json
 import logging
 import os
-from datetime import datetime
-from typing import Any, Dict, Iterable, Optional
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Mapping, Optional
 
 import boto3
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
 from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 from starlette.routing import Route
 from mangum import Mangum
 
+from services.analytics import analyze_cost
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Environment is fixed for the life of the container; read it once
+_ENV = {
+    name: os.environ.get(name, "")
+    for name in (
+        "AGENTCORE_ID_PARAM",
+        "AGENTCORE_ALIAS_PARAM",
+        "AGENTCORE_INVOKE_PARAM",
+        "AGENTCORE_ROLE_PARAM",
+        "WORKFLOW_AGENT_ENDPOINT",
+        "AWS_LAMBDA_FUNCTION_NAME",
+    )
+}
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson instead of the stdlib encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# CORS headers are static; keep them pre-encoded for the raw header list
+_CORS_RAW = (
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Authorization,Content-Type"),
+    (b"access-control-allow-methods", b"GET,POST,OPTIONS"),
+)
+
+
+class CORSJSONResponse(ORJSONResponse):
+    """ORJSONResponse that appends the static CORS headers without a dict copy."""
+
+    def init_headers(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        super().init_headers(headers)
+        self.raw_headers.extend(_CORS_RAW)
+
+
 # AgentCore integration
 try:
     from agentcore.client import AgentCoreGateway, AgentCoreConfig
@@ -36,37 +79,92 @@ except ImportError:
     STRANDS_AVAILABLE = False
 
 
+@lru_cache(maxsize=None)
+def _client(service_name: str):
+    """Return a boto3 client shared across warm invocations of this container."""
+    return boto3.client(service_name)
+
+
+# Upper bound on JSON request bodies accepted by the POST endpoints
+_MAX_BODY_BYTES = 8 << 20
+
+# Pooled keep-alive session for calls to the workflow agent endpoint
+_HTTP = requests.Session()
+_HTTP.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# SSM parameter values rarely change; reuse them for a few minutes per container
+_SSM_TTL_SECONDS = 300
+_SSM_CACHE: Dict[str, tuple] = {}
+
+
+def _ssm_get(name: str) -> str:
+    """Return an SSM parameter value, cached for _SSM_TTL_SECONDS."""
+    now = time.monotonic()
+    hit = _SSM_CACHE.get(name)
+    if hit and now - hit[0] < _SSM_TTL_SECONDS:
+        return hit[1]
+    value = _client('ssm').get_parameter(Name=name)['Parameter']['Value']
+    _SSM_CACHE[name] = (now, value)
+    return value
+
+
+@lru_cache(maxsize=None)
 def _agentcore_gateway():
-    """Initialize AgentCore gateway with environment variables."""
+    """Initialize AgentCore gateway with environment variables (once per container)."""
     if not AGENTCORE_AVAILABLE:
         raise RuntimeError("AgentCore not available")
     
     config = AgentCoreConfig(
-        agent_id_param=os.getenv("AGENTCORE_ID_PARAM", ""),
-        agent_alias_param=os.getenv("AGENTCORE_ALIAS_PARAM", ""),
-        agent_invoke_param=os.getenv("AGENTCORE_INVOKE_PARAM", ""),
-        agent_role_param=os.getenv("AGENTCORE_ROLE_PARAM", ""),
+        agent_id_param=_ENV["AGENTCORE_ID_PARAM"],
+        agent_alias_param=_ENV["AGENTCORE_ALIAS_PARAM"],
+        agent_invoke_param=_ENV["AGENTCORE_INVOKE_PARAM"],
+        agent_role_param=_ENV["AGENTCORE_ROLE_PARAM"],
     )
     return AgentCoreGateway(config)
 
 
+@lru_cache(maxsize=None)
+def _workflow_gateway():
+    """Initialize the workflow agent gateway (once per container)."""
+    if not AGENTCORE_AVAILABLE:
+        raise RuntimeError("AgentCore not available")
+    
+    config = AgentCoreConfig(
+        agent_id_param='/spendoptimo/workflow-agent/id',
+        agent_alias_param='/spendoptimo/workflow-agent/alias',
+        agent_invoke_param='/spendoptimo/workflow-agent/invoke-arn',
+        agent_role_param='/spendoptimo/workflow-agent/role-arn',
+    )
+    return AgentCoreGateway(config)
+
+
+@lru_cache(maxsize=None)
 def _strand_runner():
-    """Initialize Strands runner."""
+    """Initialize Strands runner (once per container)."""
     if not STRANDS_AVAILABLE:
         raise RuntimeError("Strands SDK not available")
     
     return SpendOptimoStrandRunner()
 
 
-async def healthcheck(request: Request) -> JSONResponse:
+# Health checks only need second resolution; reuse the serialized body
+_TS_CACHE = [0, b""]
+
+
+async def healthcheck(request: Request) -> Response:
     """Health check endpoint."""
-    return JSONResponse({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    second = int(time.time())
+    if second != _TS_CACHE[0]:
+        _TS_CACHE[0] = second
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(second)).encode()
+        _TS_CACHE[1] = b'{"status":"healthy","timestamp":"%b"}' % timestamp
+    return Response(_TS_CACHE[1], media_type="application/json")
 
 
 async def chat(request: Request) -> JSONResponse:
     """Chat endpoint that routes to AgentCore."""
     try:
-        body = await request.json()
+        body = await _read_json(request)
         goal = body.get("goal") or body.get("prompt")
         
         if not goal:
@@ -75,10 +173,7 @@ async def chat(request: Request) -> JSONResponse:
         if AGENTCORE_AVAILABLE:
             gateway = _agentcore_gateway()
             # Extract bearer token from Authorization header if present
-            auth_header = request.headers.get("authorization", "")
-            bearer_token = None
-            if auth_header.startswith("Bearer "):
-                bearer_token = auth_header[7:]
+            bearer_token = _bearer(request)
             
             response = gateway.invoke(goal=goal, bearer_token=bearer_token)
             
@@ -87,15 +182,17 @@ async def chat(request: Request) -> JSONResponse:
                 "agent": response
             }
             
-            return JSONResponse(formatted_response, headers=_cors_headers())
+            return CORSJSONResponse(formatted_response)
         else:
             # Fallback response when AgentCore is not available
             fallback_response = {
                 "message": "AgentCore is not available. Please check your deployment.",
                 "error": "agentcore_unavailable"
             }
-            return JSONResponse(fallback_response, headers=_cors_headers())
+            return CORSJSONResponse(fallback_response)
 
+    except _BodyTooLarge as exc:
+        return _error_response(str(exc), status_code=413, code="payload_too_large")
     except Exception as e:
         logger.exception("/v1/chat failed: %s", e)
         return _error_response(str(e), status_code=500, code="chat_failed")
@@ -104,8 +201,6 @@ async def chat(request: Request) -> JSONResponse:
 async def analyze(request: Request) -> JSONResponse:
     """Cost analysis endpoint."""
     try:
-        from services.analytics import analyze_cost
-
         params = request.query_params
         days = _parse_positive_int(params.get("days"), default=7)
         group_by = _split_csv(params.get("groupBy"))
@@ -119,7 +214,7 @@ async def analyze(request: Request) -> JSONResponse:
             include_anomalies=_parse_bool(params.get("anomalies") or params.get("includeAnomalies"), default=True),
             include_savings=_parse_bool(params.get("savings") or params.get("includeSavings"), default=True),
         )
-        return JSONResponse({"brand": "SpendOptimo", "analysis": data}, headers=_cors_headers())
+        return CORSJSONResponse({"brand": "SpendOptimo", "analysis": data})
     except ValueError as exc:
         return _error_response(str(exc), status_code=400, code="invalid_request")
     except Exception as e:
@@ -130,19 +225,20 @@ async def analyze(request: Request) -> JSONResponse:
 async def execute_workflow(request: Request) -> JSONResponse:
     """Execute workflow - uses workflow agent if available, otherwise falls back to Strands."""
     try:
-        body = await request.json()
+        body = await _read_json(request)
         recommendations = body.get("recommendations", [])
         
-        logger.info(f"Execute workflow called with {len(recommendations)} recommendations")
+        logger.info("Execute workflow called with %d recommendations", len(recommendations))
         
         # Get workflow agent endpoint from environment
-        workflow_endpoint = os.getenv("WORKFLOW_AGENT_ENDPOINT")
+        workflow_endpoint = _ENV["WORKFLOW_AGENT_ENDPOINT"]
         
         if workflow_endpoint:
-            # Use the workflow agent runtime (preferred)
+            # Use the workflow agent runtime (preferred). The call can take
+            # minutes, so run it off the event loop.
             logger.info("Using workflow agent runtime")
-            import requests
-            response = requests.post(
+            response = await run_in_threadpool(
+                _HTTP.post,
                 f"{workflow_endpoint}/invocations",
                 json={"recommendations": recommendations},
                 headers={'Content-Type': 'application/json'},
@@ -151,12 +247,12 @@ async def execute_workflow(request: Request) -> JSONResponse:
             
             if response.status_code == 200:
                 result = response.json()
-                return JSONResponse({
+                return CORSJSONResponse({
                     "brand": "SpendOptimoWorkflow",
                     "result": result,
-                }, headers=_cors_headers())
+                })
             else:
-                logger.error(f"Workflow agent returned {response.status_code}: {response.text}")
+                logger.error("Workflow agent returned %s: %s", response.status_code, response.text)
                 # Fall through to Strands fallback
         
         # Fallback to Strands SDK workflow
@@ -167,7 +263,7 @@ async def execute_workflow(request: Request) -> JSONResponse:
             context={"recommendations": recommendations}
         )
         
-        return JSONResponse({
+        return CORSJSONResponse({
             "brand": "SpendOptimo",
             "action": "optimize_existing_instances",
             "execution": {
@@ -176,8 +272,10 @@ async def execute_workflow(request: Request) -> JSONResponse:
                 "scheduleName": result.schedule_name,
                 "payload": result.payload,
             },
-        }, headers=_cors_headers())
+        })
         
+    except _BodyTooLarge as exc:
+        return _error_response(str(exc), status_code=413, code="payload_too_large")
     except Exception as e:
         logger.exception("/v1/execute-workflow failed: %s", e)
         return _error_response(str(e), status_code=500, code="workflow_failed")
@@ -186,38 +284,32 @@ async def execute_workflow(request: Request) -> JSONResponse:
 async def automation(request: Request) -> JSONResponse:
     """Automation endpoint - routes to workflow agent."""
     try:
-        body = await request.json()
+        body = await _read_json(request)
         recommendations = body.get("context", {}).get("recommendations", [])
+        n = len(recommendations)
         
-        logger.info(f"Automation called with {len(recommendations)} recommendations")
+        logger.info("Automation called with %d recommendations", n)
         
         # Get workflow agent endpoint from SSM
         workflow_endpoint = None
         try:
-            ssm = boto3.client('ssm')
-            param = ssm.get_parameter(Name='/spendoptimo/workflow-agent/invoke-arn')
-            workflow_endpoint = param['Parameter']['Value']
-            logger.info(f"Found workflow agent endpoint: {workflow_endpoint}")
+            workflow_endpoint = _ssm_get('/spendoptimo/workflow-agent/invoke-arn')
+            logger.info("Found workflow agent endpoint: %s", workflow_endpoint)
         except Exception as e:
-            logger.warning(f"Could not get workflow agent endpoint from SSM: {e}")
+            logger.warning("Could not get workflow agent endpoint from SSM: %s", e)
         
         if workflow_endpoint and AGENTCORE_AVAILABLE:
             # Call the workflow agent using AgentCore gateway (same as chat)
             logger.info("Calling workflow agent runtime...")
             
             # Extract bearer token
-            auth_header = request.headers.get("authorization", "")
-            bearer_token = None
-            if auth_header.startswith("Bearer "):
-                bearer_token = auth_header[7:]
+            bearer_token = _bearer(request)
             
             if not bearer_token:
                 logger.warning("No bearer token found for workflow agent")
                 return _error_response("Bearer token required for workflow execution", status_code=401)
             
             try:
-                import time
-                
                 # Create execution ID
                 execution_id = f"workflow-{int(time.time() * 1000)}"
                 
@@ -270,13 +362,13 @@ async def automation(request: Request) -> JSONResponse:
                 )
                 execution_plan += f"**Estimated Total Monthly Savings:** ${total_savings:.2f}"
                 
-                logger.info(f"Generated execution plan for {execution_id}: {len(recommendations)} recommendations")
+                logger.info("Generated execution plan for %s: %d recommendations", execution_id, n)
                 
                 # Start workflow execution in background using Lambda async invocation
-                logger.info(f"Starting async workflow execution: {execution_id}")
+                logger.info("Starting async workflow execution: %s", execution_id)
                 
-                lambda_client = boto3.client('lambda')
-                current_function = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'SpendOptimoApiFn')
+                lambda_client = _client('lambda')
+                current_function = _ENV["AWS_LAMBDA_FUNCTION_NAME"] or 'SpendOptimoApiFn'
                 
                 # Prepare async payload
                 async_payload = {
@@ -286,44 +378,51 @@ async def automation(request: Request) -> JSONResponse:
                     "execution_id": execution_id
                 }
                 
-                # Invoke async
-                lambda_client.invoke(
+                # Invoke async; the accept round-trip runs off the event loop
+                await run_in_threadpool(
+                    lambda_client.invoke,
                     FunctionName=current_function,
                     InvocationType='Event',  # Asynchronous
-                    Payload=json.dumps(async_payload).encode('utf-8')
+                    Payload=orjson.dumps(async_payload)
                 )
                 
-                logger.info(f"Async workflow invocation sent: {execution_id}")
+                logger.info("Async workflow invocation sent: %s", execution_id)
                 
                 # Return immediately with 202 Accepted and the execution plan
                 final_message = f"{execution_plan}\n\n---\n\n**Status:** Workflow execution in progress  \n**Estimated Time:** 3-5 minutes\n\nThe Workflow Agent is processing your optimizations in the background."
                 
-                return JSONResponse({
+                return CORSJSONResponse({
                     "brand": "SpendOptimoWorkflow",
                     "status": "accepted",
                     "execution_id": execution_id,
                     "result": {
                         "message": final_message,
-                        "recommendations_processed": len(recommendations),
+                        "recommendations_processed": n,
                         "execution_details": execution_plan,
                         "status": "in_progress"
                     },
-                }, status_code=202, headers=_cors_headers())
+                }, status_code=202)
             except Exception as e:
-                logger.error(f"Workflow agent invocation failed: {e}", exc_info=True)
+                logger.error("Workflow agent invocation failed: %s", e, exc_info=True)
                 return _error_response(f"Workflow agent failed: {str(e)}", status_code=500)
         
         # No workflow agent configured
         logger.error("No workflow agent endpoint configured in SSM")
         return _error_response("Workflow agent not configured", status_code=503)
+    except _BodyTooLarge as exc:
+        return _error_response(str(exc), status_code=413, code="payload_too_large")
     except Exception as e:
         logger.exception("/v1/automation failed: %s", e)
         return _error_response(str(e), status_code=500, code="automation_failed")
 
 
+# Preflight responses never vary; render the body and headers once
+_OPTIONS_RESPONSE = CORSJSONResponse({}, status_code=200)
+
+
 async def options_handler(request: Request) -> JSONResponse:
     """Handle CORS preflight requests."""
-    return JSONResponse({}, status_code=200, headers=_cors_headers())
+    return _OPTIONS_RESPONSE
 
 
 routes = [
@@ -339,71 +438,101 @@ routes = [
 ]
 
 app = Starlette(debug=False, routes=routes)
-_mangum_handler = Mangum(app)
+
+# Every path is a fixed literal, so resolve (method, path) with one dict lookup
+_ROUTE_TABLE = {
+    (method, route.path): route.endpoint
+    for route in routes
+    for method in route.methods
+}
+
+
+async def _dispatch(scope, receive, send) -> None:
+    """ASGI entry that serves known routes directly and defers the rest to Starlette."""
+    if scope["type"] == "http":
+        endpoint = _ROUTE_TABLE.get((scope["method"], scope["path"]))
+        if endpoint is not None:
+            response = await endpoint(Request(scope, receive))
+            await response(scope, receive, send)
+            return
+    await app(scope, receive, send)
+
+
+_mangum_handler = Mangum(_dispatch)
+
+
+def _run_async_workflow(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a workflow handed off by automation() through an async self-invocation."""
+    logger.info("Handling async workflow execution")
+    recommendations = event.get("recommendations", [])
+    bearer_token = event.get("bearer_token")
+    execution_id = event.get("execution_id", "unknown")
+    
+    try:
+        workflow_gateway = _workflow_gateway()
+        
+        # Invoke workflow agent with recommendations
+        prompt = orjson.dumps(recommendations).decode()
+        logger.info(f"Invoking workflow agent for execution {execution_id} with {len(recommendations)} recommendations")
+        logger.info(f"Recommendation types: {set(r.get('resource_type') for r in recommendations)}")
+        response = workflow_gateway.invoke(goal=prompt, bearer_token=bearer_token)
+        
+        logger.info(f"Workflow execution {execution_id} completed successfully")
+        logger.info(f"Workflow response: {str(response)[:300]}...")
+        return {
+            "statusCode": 200,
+            "body": orjson.dumps({
+                "execution_id": execution_id,
+                "status": "completed",
+                "message": response.get("message", "Workflow executed")
+            }).decode()
+        }
+    except Exception as e:
+        logger.error(f"Async workflow execution {execution_id} failed: {e}", exc_info=True)
+        return {
+            "statusCode": 500,
+            "body": orjson.dumps({
+                "execution_id": execution_id,
+                "status": "failed",
+                "error": str(e)
+            }).decode()
+        }
 
 
 # Wrap Mangum handler to intercept async workflow executions
 def handler(event, context):
     """Lambda handler that intercepts async workflow executions."""
-    # Check if this is an async workflow execution
-    if isinstance(event, dict) and event.get("_async_workflow"):
-        logger.info("Handling async workflow execution")
-        recommendations = event.get("recommendations", [])
-        bearer_token = event.get("bearer_token")
-        execution_id = event.get("execution_id", "unknown")
-        
-        try:
-            # Create a gateway config for the workflow agent
-            workflow_config = AgentCoreConfig(
-                agent_id_param='/spendoptimo/workflow-agent/id',
-                agent_alias_param='/spendoptimo/workflow-agent/alias',
-                agent_invoke_param='/spendoptimo/workflow-agent/invoke-arn',
-                agent_role_param='/spendoptimo/workflow-agent/role-arn',
-            )
-            workflow_gateway = AgentCoreGateway(workflow_config)
-            
-            # Invoke workflow agent with recommendations
-            prompt = json.dumps(recommendations, indent=2)
-            logger.info(f"Invoking workflow agent for execution {execution_id} with {len(recommendations)} recommendations")
-            logger.info(f"Recommendation types: {set(r.get('resource_type') for r in recommendations)}")
-            response = workflow_gateway.invoke(goal=prompt, bearer_token=bearer_token)
-            
-            logger.info(f"Workflow execution {execution_id} completed successfully")
-            logger.info(f"Workflow response: {str(response)[:300]}...")
-            return {
-                "statusCode": 200,
-                "body": json.dumps({
-                    "execution_id": execution_id,
-                    "status": "completed",
-                    "message": response.get("message", "Workflow executed")
-                })
-            }
-        except Exception as e:
-            logger.error(f"Async workflow execution {execution_id} failed: {e}", exc_info=True)
-            return {
-                "statusCode": 500,
-                "body": json.dumps({
-                    "execution_id": execution_id,
-                    "status": "failed",
-                    "error": str(e)
-                })
-            }
+    # Async self-invocations carry a top-level marker that HTTP events never have
+    if type(event) is dict and "_async_workflow" in event:
+        return _run_async_workflow(event)
     
     # Normal HTTP request - pass to Mangum
     return _mangum_handler(event, context)
 
 
-def _cors_headers() -> Dict[str, str]:
-    return {
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Headers": "Authorization,Content-Type",
-        "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
-    }
-
-
 def _error_response(message: str, *, status_code: int, code: str | None = None) -> JSONResponse:
     body = {"error": code or "error", "message": message}
-    return JSONResponse(body, status_code=status_code, headers=_cors_headers())
+    return CORSJSONResponse(body, status_code=status_code)
+
+
+class _BodyTooLarge(ValueError):
+    pass
+
+
+async def _read_json(request: Request, max_bytes: int = _MAX_BODY_BYTES) -> Any:
+    """Read and parse a JSON body, aborting once it grows past max_bytes."""
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise _BodyTooLarge(f"Request body exceeds {max_bytes} bytes")
+    return orjson.loads(buffer)
+
+
+def _bearer(request: Request) -> Optional[str]:
+    header = request.headers.get("authorization", "")
+    token = header.removeprefix("Bearer ")
+    return token if token != header else None
 
 
 def _parse_positive_int(value: Optional[str], *, default: int) -> int:
@@ -418,13 +547,17 @@ def _parse_positive_int(value: Optional[str], *, default: int) -> int:
     return parsed
 
 
+_TRUE = frozenset(("true", "1", "yes", "y", "on"))
+_FALSE = frozenset(("false", "0", "no", "n", "off"))
+
+
 def _parse_bool(value: Optional[str], *, default: bool) -> bool:
     if value is None:
         return default
     lowered = value.strip().lower()
-    if lowered in {"true", "1", "yes", "y", "on"}:
+    if lowered in _TRUE:
         return True
-    if lowered in {"false", "0", "no", "n", "off"}:
+    if lowered in _FALSE:
         return False
     return default
 
@@ -432,6 +565,9 @@ def _parse_bool(value: Optional[str], *, default: bool) -> bool:
 def _split_csv(raw: Optional[str]) -> Optional[Iterable[str]]:
     if not raw:
         return None
-    values = [item.strip() for item in raw.split(",") if item.strip()]
+    if "," not in raw:
+        value = raw.strip()
+        return [value] if value else None
+    values = [item for item in (part.strip() for part in raw.split(",")) if item]
     return values or None
 